@@ -3,19 +3,42 @@ Montana Feed Company - Configuration and Client Setup
 Version 3.0.0 - Modular Refactor
 """
 
+import asyncio
+import atexit
+import functools
 import os
 import logging
+import logging.handlers
+import queue
 from typing import Optional
 from contextlib import asynccontextmanager
 
 import httpx
-from supabase import create_client, Client
+import orjson
+from supabase import ClientOptions, create_client, Client
 
 # ============================================================================
 # LOGGING
 # ============================================================================
 
-logging.basicConfig(level=logging.INFO)
+# Records are handed to a queue and written to stderr by a QueueListener
+# thread, so the blocking stderr write happens off the event loop. Only the
+# write moves: QueueHandler.prepare() still formats each record (tracebacks
+# included) on the calling thread. Same output format as the plain
+# basicConfig this replaces. The listener is stopped at interpreter exit —
+# not in lifespan — so shutdown logging still gets flushed.
+_log_queue: queue.SimpleQueue = queue.SimpleQueue()
+_log_stream_handler = logging.StreamHandler()
+_log_stream_handler.setFormatter(logging.Formatter(logging.BASIC_FORMAT))
+_log_listener = logging.handlers.QueueListener(_log_queue, _log_stream_handler)
+# LOG_LEVEL (default INFO) gates everything below it before any formatting
+# happens; set DEBUG to see the per-row / per-batch trace lines.
+_log_level = logging.getLevelName(os.getenv("LOG_LEVEL", "INFO").strip().upper())
+if not isinstance(_log_level, int):
+    _log_level = logging.INFO
+logging.basicConfig(level=_log_level, handlers=[logging.handlers.QueueHandler(_log_queue)])
+_log_listener.start()
+atexit.register(_log_listener.stop)
 logger = logging.getLogger(__name__)
 
 # ============================================================================
@@ -25,6 +48,8 @@ logger = logging.getLogger(__name__)
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_KEY")
 ZEP_API_KEY = os.getenv("ZEP_API_KEY", "").strip()
+SUPABASE_MAX_CONCURRENCY = int(os.getenv("SUPABASE_MAX_CONCURRENCY", "10"))
+SUPABASE_TIMEOUT_SECONDS = float(os.getenv("SUPABASE_TIMEOUT_SECONDS", "10"))
 
 # Validate critical env vars
 if not SUPABASE_URL or not SUPABASE_KEY:
@@ -36,14 +61,58 @@ if not ZEP_API_KEY:
 # CLIENT INITIALIZATION
 # ============================================================================
 
-# Supabase client
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY) if SUPABASE_URL and SUPABASE_KEY else None
+# Supabase client. Every query runs through asyncio.to_thread, so concurrent
+# Retell calls hit PostgREST from several worker threads at once. Hand the
+# client one explicitly sized, keep-alive httpx pool (thread-safe for sync
+# requests) instead of letting it build its own with default limits, so TLS
+# setup is paid once and in-flight DB requests stay bounded. We only use
+# table()/rpc() — i.e. postgrest, which pins this client's base_url to the
+# REST endpoint — so don't route storage/functions through this instance.
+#
+# Timeouts: passing httpx_client= makes supabase-py ignore
+# ClientOptions.postgrest_client_timeout, so this client's timeout is the
+# one every query gets — replacing postgrest's 120s default. It defaults to
+# SUPABASE_TIMEOUT_SECONDS=10 because almost every query sits on a tool
+# call the caller is waiting on in silence: a query still running after 10s
+# has lost that turn anyway, and at 120s a hung PostgREST request would pin
+# a pool connection and a run_db slot for two minutes. Connect is 2s — with
+# a warm keep-alive pool a fresh connect is rare, and one that takes longer
+# means PostgREST is unreachable, not slow. The trade-off: a genuinely slow
+# query (the KB `match_knowledge_base` RPC, which calls OpenAI from inside
+# Supabase, or the call_ended lead upsert on a bad day) now fails with an
+# error instead of finishing late. Raise SUPABASE_TIMEOUT_SECONDS if that
+# shows up in the logs.
+_supabase_http = httpx.Client(
+    timeout=httpx.Timeout(SUPABASE_TIMEOUT_SECONDS, connect=min(2.0, SUPABASE_TIMEOUT_SECONDS)),
+    limits=httpx.Limits(max_keepalive_connections=10, max_connections=20),
+)
+supabase: Client = (
+    create_client(SUPABASE_URL, SUPABASE_KEY, options=ClientOptions(httpx_client=_supabase_http))
+    if SUPABASE_URL and SUPABASE_KEY else None
+)
+
+# Cap on Supabase queries in flight at once. A burst of parallel calls used
+# to fan every DB read straight out to PostgREST (and the thread pool); past
+# the pool size that turns into "All connection attempts failed" storms.
+# Queries beyond the cap now wait their turn here instead. Keep it at or
+# below the httpx pool's max_connections above.
+_db_semaphore = asyncio.Semaphore(SUPABASE_MAX_CONCURRENCY)
+
+
+async def run_db(fn):
+    """Run a blocking supabase-py call (`lambda: supabase.table(...)...
+    .execute()`) in a worker thread, with at most SUPABASE_MAX_CONCURRENCY
+    running at once. Use this for every Supabase query from async code."""
+    async with _db_semaphore:
+        return await asyncio.to_thread(fn)
 
 # ============================================================================
 # ZEP CLOUD REST API CONFIGURATION
 # ============================================================================
 
 ZEP_BASE_URL = "https://api.getzep.com/api/v2"
+# Content-Type is load-bearing: the Zep helpers send orjson-encoded bytes
+# via `content=` rather than httpx's `json=`, which would otherwise set it.
 ZEP_HEADERS = {
     "Authorization": f"Api-Key {ZEP_API_KEY}",
     "Content-Type": "application/json"
@@ -72,11 +141,30 @@ def get_http_client() -> Optional[httpx.AsyncClient]:
 # HELPER FUNCTIONS
 # ============================================================================
 
+def response_json(response: httpx.Response):
+    """Decode an httpx response body with orjson. Parses the raw bytes
+    directly instead of `response.json()`'s decode-to-str + stdlib json."""
+    return orjson.loads(response.content)
+
+
 def normalize_phone(phone: str) -> str:
     """Normalize phone number for consistent user IDs."""
     return phone.replace("+", "").replace(" ", "").replace("-", "")
 
 
+@functools.lru_cache(maxsize=4096)
+def caller_user_id(phone: str) -> str:
+    """Zep user id for a caller's phone number ("caller_14065551234").
+
+    Memoized: the same number is turned into a user id by call_inbound, the
+    tool handlers and the call_ended save within one call. Deliberately
+    keeps normalize_phone's exact rules (strip "+", spaces and dashes only)
+    rather than stripping every non-digit — changing the rules would change
+    the ids of existing callers and orphan their Zep memory.
+    """
+    return f"caller_{normalize_phone(phone)}"
+
+
 def redact_phone(phone: str) -> str:
     """Mask a caller identifier for logging. Keeps the last 4 digits so on-call
     can still correlate a specific complaint against logs, without spraying
@@ -108,9 +196,16 @@ async def lifespan(app):
     global _zep_client, _http_client
 
     # Startup: create persistent HTTP clients
+    # Zep over HTTP/2: concurrent lookups/saves multiplex over one TLS
+    # connection instead of queueing per HTTP/1.1 connection or paying a
+    # fresh handshake when the pool is busy. Auth headers live on the client
+    # so the zep_* helpers don't pass them per request. Timeouts stay tight
+    # — Zep sits on the call_inbound path Retell is waiting on.
     _zep_client = httpx.AsyncClient(
+        http2=True,
+        headers=ZEP_HEADERS,
         timeout=httpx.Timeout(5.0, connect=2.0),
-        limits=httpx.Limits(max_keepalive_connections=5, max_connections=10),
+        limits=httpx.Limits(max_keepalive_connections=5, max_connections=10, keepalive_expiry=30.0),
     )
     logger.info("✓ Started persistent Zep HTTP client")
 
@@ -131,3 +226,5 @@ async def lifespan(app):
     if _http_client:
         await _http_client.aclose()
         logger.info("✓ Closed outbound HTTP client")
+    _supabase_http.close()
+    logger.info("✓ Closed Supabase HTTP pool")
@@ -14,6 +14,7 @@ Version 3.1.1 - 2026-07-31 deep review fixes
 """
 
 import asyncio
+import hashlib
 import html
 import os
 import re
@@ -42,8 +43,10 @@ if _sentry_dsn:
     )
 
 import httpx
+import orjson
 from fastapi import BackgroundTasks, FastAPI, Request
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse, Response
+from pydantic import BaseModel, ConfigDict, ValidationError, field_validator
 
 from retell_auth import (
     read_and_verify,
@@ -57,10 +60,12 @@ from config import (
     supabase,
     ZEP_API_KEY,
     ZEP_BASE_URL,
-    ZEP_HEADERS,
     get_zep_client,
     get_http_client,
+    run_db,
+    response_json,
     normalize_phone,
+    caller_user_id,
     redact_phone,
     lifespan,
     logger,
@@ -72,6 +77,7 @@ from skills import (
     lookup_caller_fast,
     save_call_to_zep,
     zep_update_user_metadata,
+    forget_zep_user,
     # Specialists
     lookup_specialist_by_town,
     lookup_staff_by_name,
@@ -90,8 +96,9 @@ from skills import (
     search_products,
     recommend_products,
 )
-from skills.memory import _fire_and_forget
-from skills.specialists import get_specialist_by_email, lookup_staff_by_phone
+from skills.memory import _background_tasks, _fire_and_forget
+from skills.products import _format_product
+from skills.specialists import _sanitize_name, get_specialist_by_email, lookup_staff_by_phone
 from skills.warehouses import lookup_warehouse_by_did
 
 # Main office fallback number for the voice agent. Single source of truth —
@@ -100,6 +107,64 @@ from skills.warehouses import lookup_warehouse_by_did
 MFC_MAIN_OFFICE_PHONE = "406-728-7020"
 MFC_MAIN_OFFICE_E164 = "+1" + MFC_MAIN_OFFICE_PHONE.replace("-", "")
 
+# Fixed-shape replies for the degraded / short-circuit branches (missing
+# args, no match, handler crash). Their content never varies per call, so
+# they're encoded once at import and served as raw bytes via _canned()
+# instead of rebuilding and re-serializing the same dict on every request.
+_EMPTY_BODY = orjson.dumps({})
+_CHAT_INBOUND_BODY = orjson.dumps({"chat_inbound": {}})
+_INTERNAL_ERROR_BODY = orjson.dumps({"error": "internal error"})
+_END_CALL_BODY = orjson.dumps({"result": "Thanks for calling Montana Feed!", "success": True})
+_WAREHOUSE_NO_TERMS_BODY = orjson.dumps({
+    "result": (
+        "We have five locations — Dillon, Miles City, Lewistown, "
+        "Columbus, and Riverton. Which one would you like the hours "
+        "or address for?"
+    ),
+    "success": False,
+})
+_WAREHOUSE_NO_MATCH_BODY = orjson.dumps({
+    "result": (
+        f"I couldn't match that to one of our stores. We have "
+        f"locations in Dillon, Miles City, Lewistown, Columbus, and "
+        f"Riverton. You can also reach our main office at "
+        f"{MFC_MAIN_OFFICE_PHONE}."
+    ),
+    "success": False,
+})
+_PRODUCTS_NO_MATCH_BODY = orjson.dumps({
+    "result": (
+        "I didn't find a match for that in our catalog. We carry "
+        "Purina and Montana Feed Company minerals, protein "
+        "supplements, range cubes, complete feeds, grains, and "
+        "supplement tubs — want me to have a specialist follow up?"
+    ),
+    "success": False,
+    "match_count": 0,
+})
+_RECOMMENDATIONS_NO_MATCH_BODY = orjson.dumps({
+    "result": (
+        "I'd want a livestock specialist to point you to the right "
+        "product for that. Can I take your info and have one reach "
+        "out, or is there a specific category you're after — minerals, "
+        "protein supplements, or complete feeds?"
+    ),
+    "success": False,
+    "match_count": 0,
+})
+_STAFF_NAME_MISSING_BODY = orjson.dumps({
+    "result": "I need a name to search for. Who are you trying to reach?",
+    "success": False,
+    "match_count": 0,
+    "matches": [],
+    "main_office": MFC_MAIN_OFFICE_PHONE,
+})
+
+
+def _canned(body: bytes, status_code: int = 200) -> Response:
+    """Wrap one of the pre-encoded payloads above in a JSON response."""
+    return Response(content=body, status_code=status_code, media_type="application/json")
+
 
 def _to_e164(phone) -> str | None:
     """Normalize a US/Canada number to E.164 (+1XXXXXXXXXX).
@@ -234,6 +299,84 @@ def _release_zep_save(call_id: str) -> None:
         _zep_saved_calls.pop(call_id, None)
 
 
+# Retell re-sends a tool call when our response is slow, and the LLM will
+# occasionally fire the same tool twice in one turn. For the two tools that
+# write rows and send email (create_lead, schedule_callback) that meant a
+# duplicate lead / callback row and a second specialist email. The first
+# successful response for (call_id, tool, args) is remembered here and
+# replayed to repeats; a repeat that lands while the first is still running
+# waits on it. "Successful" means the handler said so — HTTP 200 AND
+# `"success": true` in the body. Both tools answer 200 with
+# `"success": false` when the write failed (so the agent can still speak),
+# and replaying that would stop every retry from saving the lead. Args are
+# part of the key on purpose — one call can legitimately leave two
+# different messages. Process-local (--workers 1).
+_TOOL_REPLAY_TTL_SECONDS = 10 * 60
+_tool_replays: dict[tuple[str, str, str], dict] = {}
+
+
+def _tool_replay_key(tool: str, body: dict, call: "RetellCall") -> tuple[str, str, str] | None:
+    if not call.call_id:
+        return None  # can't dedupe without an id
+    args = orjson.dumps(_extract_args(body), option=orjson.OPT_SORT_KEYS)
+    return call.call_id, tool, hashlib.sha256(args).hexdigest()
+
+
+def _tool_succeeded(response: Response) -> bool:
+    """True only for a 200 whose JSON body carries `"success": true`."""
+    if response.status_code != 200:
+        return False
+    try:
+        payload = orjson.loads(response.body)
+    except orjson.JSONDecodeError:
+        return False
+    return isinstance(payload, dict) and payload.get("success") is True
+
+
+def idempotent_tool(tool: str):
+    """Decorator (applied under @retell_function) that makes a side-effecting
+    tool safe to repeat within a call: duplicates get the first successful
+    response body back instead of re-running the handler. Runs that are
+    non-200 or report `"success": false` are forgotten so a retry can go
+    through for real."""
+    def decorator(handler):
+        async def wrapped(body: dict, call: "RetellCall"):
+            key = _tool_replay_key(tool, body, call)
+            if key is None:
+                return await handler(body, call)
+
+            now = time.time()
+            for k in [k for k, v in _tool_replays.items() if now - v["ts"] > _TOOL_REPLAY_TTL_SECONDS]:
+                _tool_replays.pop(k, None)
+
+            prior = _tool_replays.get(key)
+            if prior is not None:
+                replay = await asyncio.shield(prior["done"])
+                if replay is not None:
+                    logger.info(f"[{tool.upper()}] Duplicate tool call for {key[0]} — replaying first response")
+                    return _canned(replay)
+                return await handler(body, call)
+
+            done = asyncio.get_running_loop().create_future()
+            _tool_replays[key] = {"done": done, "ts": now}
+            replay = None
+            try:
+                response = await handler(body, call)
+                if _tool_succeeded(response):
+                    replay = bytes(response.body)
+                return response
+            finally:
+                if replay is None:
+                    _tool_replays.pop(key, None)
+                done.set_result(replay)
+
+        wrapped.__name__ = handler.__name__
+        wrapped.__qualname__ = handler.__qualname__
+        wrapped.__doc__ = handler.__doc__
+        return wrapped
+    return decorator
+
+
 def _extract_args(body: dict) -> dict:
     """Retell has changed its tool-call body shape multiple times. Today
     (2026-05-13) the actual arguments arrive under `body["args"]` with the
@@ -262,6 +405,78 @@ def _extract_args(body: dict) -> dict:
     return {k: v for k, v in body.items() if k not in _ENVELOPE_KEYS}
 
 
+class RetellCall(BaseModel):
+    """The slice of Retell's `call` envelope the tool handlers read. The
+    envelope also carries the transcript, dynamic variables, etc. — those
+    are ignored here, not validated. Widget calls send a null
+    from_number, which is normalized to "". Each field is coerced on its
+    own (numbers to str, anything else unusable to "") so one odd value
+    can't fail the whole envelope and take call_id — and with it tool
+    dedupe and the per-caller cache — down with it."""
+    model_config = ConfigDict(extra="ignore", frozen=True)
+
+    call_id: str = ""
+    from_number: str = ""
+    to_number: str = ""
+
+    @field_validator("call_id", "from_number", "to_number", mode="before")
+    @classmethod
+    def _coerce_to_str(cls, v):
+        if v is None:
+            return ""
+        if isinstance(v, str):
+            return v
+        if isinstance(v, (int, float)):
+            return str(v)
+        return ""
+
+    @property
+    def caller_key(self) -> str:
+        """Per-call cache key, mirroring the webhooks' keying: from_number,
+        or widget_{call_id} for widget calls ("" if Retell sent neither)."""
+        return self.from_number or (f"widget_{self.call_id}" if self.call_id else "")
+
+    @classmethod
+    def from_body(cls, body: dict) -> "RetellCall":
+        call = body.get("call")
+        if not isinstance(call, dict):
+            return cls()
+        try:
+            return cls.model_validate(call)
+        except ValidationError as e:
+            logger.warning(f"[RETELL] Unexpected call envelope shape: {e}")
+            return cls()
+
+
+def retell_function(tag: str):
+    """Decorator for the /retell/functions/* endpoints. Every tool call
+    shares the same envelope — verify the Retell signature, parse the JSON
+    body once, and turn any uncaught exception into a logged 500 — so that
+    lives here and the handler receives the parsed body dict plus its
+    `call` envelope already parsed into a RetellCall.
+
+    Deliberately NOT functools.wraps: FastAPI builds the route from the
+    endpoint signature (following __wrapped__), and it must see
+    `request: Request`, not the handler's `body: dict`.
+    """
+    def decorator(handler):
+        async def endpoint(request: Request):
+            ok, _raw, body = await read_and_verify(request)
+            if not ok:
+                return unauthorized_response()
+            try:
+                return await handler(body, RetellCall.from_body(body))
+            except Exception as e:
+                logger.exception("[%s] Error: %s", tag, e)
+                return _canned(_INTERNAL_ERROR_BODY, status_code=500)
+
+        endpoint.__name__ = handler.__name__
+        endpoint.__qualname__ = handler.__qualname__
+        endpoint.__doc__ = handler.__doc__
+        return endpoint
+    return decorator
+
+
 # Retell envelope fields that are never tool arguments. Stripped from the
 # legacy flat-body fallback in _extract_args so a future Retell shape change
 # fails loudly (missing arg) instead of silently searching for a tool's name.
@@ -467,16 +682,19 @@ async def send_specialist_email(specialist_email: str, specialist_name: str, cal
             return False
                 
     except Exception as e:
-        logger.error(f"❌ Email error: {e}", exc_info=True)
+        logger.exception("❌ Email error: %s", e)
         return False
 
 # ============================================================================
 # FASTAPI APPLICATION
 # ============================================================================
 
+# orjson for every response — including plain-dict returns like /health —
+# since each Retell webhook answer is serialized on the caller's dead air.
 app = FastAPI(
     title="Montana Feed Retell Webhook",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse,
 )
 
 # ============================================================================
@@ -506,7 +724,6 @@ async def debug_state(request: Request):
     same X-Admin-Token used by /fix-zep-user and /set-user-location."""
     if not verify_admin_token(request):
         return forbidden_response()
-    from skills.memory import _background_tasks
     return {
         "active_calls_cached": len(_call_cache),
         "background_tasks": len(_background_tasks),
@@ -685,7 +902,7 @@ async def retell_inbound_webhook(request: Request, background_tasks: BackgroundT
             if conversation_history:
                 logger.info(f"[INBOUND] Context: {conversation_history[:100]}")
 
-            return JSONResponse(content={
+            return ORJSONResponse(content={
                 "call_inbound": {
                     "dynamic_variables": dynamic_vars
                 }
@@ -762,13 +979,11 @@ async def retell_inbound_webhook(request: Request, background_tasks: BackgroundT
             # Create a formatted summary from transcript
             call_summary = ""
             if transcript_object:
-                messages = []
-                for msg in transcript_object:
-                    role = "Caller" if msg.get("role") == "user" else "Agent"
-                    content = msg.get("content", "")
-                    if content:
-                        messages.append(f"{role}: {content}")
-                call_summary = "\n\n".join(messages)
+                call_summary = "\n\n".join(
+                    f"{'Caller' if msg.get('role') == 'user' else 'Agent'}: {content}"
+                    for msg in transcript_object
+                    if (content := msg.get("content"))
+                )
             elif transcript:
                 call_summary = transcript
 
@@ -796,7 +1011,7 @@ async def retell_inbound_webhook(request: Request, background_tasks: BackgroundT
                     }
 
                     # Wrap blocking Supabase call so it doesn't block the event loop
-                    conversation_result = await asyncio.to_thread(
+                    conversation_result = await run_db(
                         lambda: supabase.table("conversations").insert(conversation_data).execute()
                     )
 
@@ -824,13 +1039,13 @@ async def retell_inbound_webhook(request: Request, background_tasks: BackgroundT
 
                             if messages_payload:
                                 # Single batched insert instead of N inserts
-                                await asyncio.to_thread(
+                                await run_db(
                                     lambda: supabase.table("conversation_messages").insert(messages_payload).execute()
                                 )
                                 logger.info(f"✅ Saved {len(messages_payload)} messages to conversation_messages (batched)")
 
                 except Exception as e:
-                    logger.error(f"❌ Failed to save to Supabase: {e}", exc_info=True)
+                    logger.exception("❌ Failed to save to Supabase: %s", e)
 
             # ====================================================================
             # SEND EMAIL — to the assigned specialist if known, else catch-all
@@ -838,14 +1053,18 @@ async def retell_inbound_webhook(request: Request, background_tasks: BackgroundT
             specialist_email = None
             if specialist_name and supabase:
                 try:
-                    # Sanity-cap inputs before sending to ilike()
-                    name_parts = specialist_name.split(None, 1)
+                    # Sanity-cap inputs before sending to ilike(). The values
+                    # go out as bound query params (no or_() string to inject
+                    # into), but `%`, `_` and `*` would still act as ILIKE
+                    # wildcards — strip to name characters so this stays an
+                    # exact case-insensitive match.
+                    name_parts = _sanitize_name(specialist_name).split(None, 1) or [""]
                     first_name = name_parts[0][:50]
                     last_name = (name_parts[1] if len(name_parts) > 1 else "")[:50]
 
                     logger.info(f"[EMAIL] Looking up email for: {first_name} {last_name}")
 
-                    result = await asyncio.to_thread(
+                    result = await run_db(
                         lambda: supabase.table("specialists")
                             .select("email, first_name, last_name")
                             .ilike("first_name", first_name)
@@ -920,7 +1139,7 @@ async def retell_inbound_webhook(request: Request, background_tasks: BackgroundT
             _call_cache.pop(caller_key, None)
             logger.info(f"[CACHE] Cleaned up cache for {redact_phone(caller_key)}")
 
-            return JSONResponse(content={
+            return ORJSONResponse(content={
                 "call_id": call_id,
                 "conversation_id": conversation_id,
                 "messages_saved": len(transcript_object) if transcript_object else 0,
@@ -932,7 +1151,7 @@ async def retell_inbound_webhook(request: Request, background_tasks: BackgroundT
         # ========================================================================
         elif event == "call_analyzed":
             logger.info(f"Call analyzed event received")
-            return JSONResponse(content={})
+            return _canned(_EMPTY_BODY)
 
         # ========================================================================
         # CHAT INBOUND (SMS)
@@ -940,15 +1159,15 @@ async def retell_inbound_webhook(request: Request, background_tasks: BackgroundT
         elif event == "chat_inbound":
             chat_inbound = body.get("chat_inbound", {})
             logger.info(f"SMS inbound from: {chat_inbound.get('from_number', '')}")
-            return JSONResponse(content={"chat_inbound": {}})
+            return _canned(_CHAT_INBOUND_BODY)
 
         else:
             logger.warning(f"Unknown inbound event: {event}")
-            return JSONResponse(content={})
+            return _canned(_EMPTY_BODY)
 
     except Exception as e:
-        logger.error(f"Inbound webhook error: {e}", exc_info=True)
-        return JSONResponse(content={})
+        logger.exception("Inbound webhook error: %s", e)
+        return _canned(_EMPTY_BODY)
 
 
 @app.post("/retell-webhook")
@@ -1006,16 +1225,16 @@ async def retell_webhook(request: Request):
             if save_result.get("extracted_location"):
                 logger.info(f"[SAVE] Location extracted: {save_result['extracted_location']}")
 
-            return JSONResponse(content={
+            return ORJSONResponse(content={
                 "call_id": call_id,
                 "memory_saved": save_result.get("success", False)
             })
 
-        return JSONResponse(content={"call_id": call_id})
+        return ORJSONResponse(content={"call_id": call_id})
 
     except Exception as e:
-        logger.error(f"[AGENT] Webhook error: {e}", exc_info=True)
-        return JSONResponse(status_code=500, content={"error": "Internal server error"})
+        logger.exception("[AGENT] Webhook error: %s", e)
+        return ORJSONResponse(status_code=500, content={"error": "Internal server error"})
 
 
 @app.post("/fix-zep-user")
@@ -1031,7 +1250,7 @@ async def fix_zep_user(request: Request):
         if not phone or not name:
             return {"error": "Provide phone and name"}
 
-        user_id = f"caller_{normalize_phone(phone)}"
+        user_id = caller_user_id(phone)
 
         _zep_client = get_zep_client()
         if not _zep_client:
@@ -1039,9 +1258,9 @@ async def fix_zep_user(request: Request):
 
         response = await _zep_client.patch(
             f"{ZEP_BASE_URL}/users/{user_id}",
-            headers=ZEP_HEADERS,
             json={"first_name": name}
         )
+        forget_zep_user(user_id)
 
         if response.status_code == 200:
             name_parts = name.split(None, 1)
@@ -1067,7 +1286,7 @@ async def set_user_location(request: Request):
         if not phone or not location:
             return {"error": "Provide phone and location"}
 
-        user_id = f"caller_{normalize_phone(phone)}"
+        user_id = caller_user_id(phone)
         success = await zep_update_user_metadata(user_id, {"location": location})
 
         if success:
@@ -1100,7 +1319,7 @@ async def debug_staff_lookup(request: Request):
             "matches": matches,
         }
     except Exception as e:
-        logger.error(f"[DEBUG_STAFF_LOOKUP] error: {e}", exc_info=True)
+        logger.exception("[DEBUG_STAFF_LOOKUP] error: %s", e)
         return {"error": str(e)}
 
 
@@ -1127,7 +1346,7 @@ async def clear_zep_metadata(request: Request):
         if not phone or not isinstance(keys, list) or not keys:
             return {"error": "Provide phone and a non-empty keys list"}
 
-        user_id = f"caller_{normalize_phone(phone)}"
+        user_id = caller_user_id(phone)
 
         _zep_client = get_zep_client()
         if not _zep_client:
@@ -1135,14 +1354,14 @@ async def clear_zep_metadata(request: Request):
 
         # Fetch current user metadata
         get_resp = await _zep_client.get(
-            f"{ZEP_BASE_URL}/users/{user_id}", headers=ZEP_HEADERS
+            f"{ZEP_BASE_URL}/users/{user_id}"
         )
         if get_resp.status_code != 200:
             return {
                 "success": False,
                 "error": f"Zep GET failed: {get_resp.status_code} {get_resp.text}",
             }
-        user = get_resp.json()
+        user = response_json(get_resp)
         md_before = user.get("metadata") or {}
 
         # Compute trimmed metadata
@@ -1173,9 +1392,9 @@ async def clear_zep_metadata(request: Request):
             merge_payload[k] = ""
         patch_resp = await _zep_client.patch(
             f"{ZEP_BASE_URL}/users/{user_id}",
-            headers=ZEP_HEADERS,
             json={"metadata": merge_payload},
         )
+        forget_zep_user(user_id)
         if patch_resp.status_code != 200:
             return {
                 "success": False,
@@ -1183,7 +1402,8 @@ async def clear_zep_metadata(request: Request):
             }
 
         # Invalidate the per-call cache for this caller so an in-flight call
-        # picks up the fresh metadata. Safe no-op if not cached.
+        # picks up the fresh metadata (the Zep user cache was dropped right
+        # after the PATCH). Safe no-op if not cached.
         for k in (phone, user_id, f"+{normalize_phone(phone)}"):
             _call_cache.pop(k, None)
 
@@ -1195,7 +1415,7 @@ async def clear_zep_metadata(request: Request):
         }
 
     except Exception as e:
-        logger.error(f"[CLEAR_ZEP_METADATA] error: {e}", exc_info=True)
+        logger.exception("[CLEAR_ZEP_METADATA] error: %s", e)
         return {"error": str(e)}
 
 
@@ -1204,96 +1424,96 @@ async def clear_zep_metadata(request: Request):
 # ============================================================================
 
 @app.post("/retell/functions/lookup_town")
-async def lookup_town(request: Request):
+@retell_function("LOOKUP_TOWN")
+async def lookup_town(body: dict, call: RetellCall):
     """Look up specialist by town and save to Zep metadata."""
-    ok, _raw, body = await read_and_verify(request)
-    if not ok:
-        return unauthorized_response()
-    try:
-        args = _extract_args(body)
-        # `town_name` is the parameter name in the Retell tool schema (see
-        # retell_mfc_config.json + the v11 prompt's tool table); the rest are
-        # accepted defensively in case the dashboard config drifts.
-        town = (args.get("town_name", "") or args.get("town", "")
-                or args.get("location", "") or args.get("city", ""))
-
-        call_data = body.get("call", {})
-        phone = call_data.get("from_number", "")
-        call_id = call_data.get("call_id", "")
-        # Mirror the webhooks' cache keying so widget calls (no from_number)
-        # still get per-call specialist recovery in schedule_callback.
-        caller_key = phone or (f"widget_{call_id}" if call_id else "")
-
-        logger.info(f"[LOOKUP_TOWN] Searching for: '{town}'")
-
-        specialist = await lookup_specialist_by_town(town)
-
-        if specialist:
-            # Zep memory is phone-keyed — widget callers have no Zep record.
-            # Fire-and-forget: the Zep GET+PATCH pair can take seconds on a
-            # slow Zep day, and the caller is sitting in silence waiting for
-            # this tool to answer. The save only benefits FUTURE calls.
-            if phone:
-                user_id = f"caller_{normalize_phone(phone)}"
-                _fire_and_forget(
-                    zep_update_user_metadata(user_id, {
-                        "specialist": specialist["specialist_name"],
-                        "location": specialist.get("territory", town)
-                    }),
-                    label=f"lookup_town_zep_save({redact_phone(phone)})",
-                )
-
-            # Stash for schedule_callback's fallback. If the caller later
-            # says "leave a message" without the agent passing specialist
-            # info, schedule_callback pulls from here so the email actually
-            # routes to the right person.
-            _stash_recent_specialist(
-                caller_key,
-                specialist_id=specialist.get("id"),
-                specialist_name=specialist.get("specialist_name"),
-                specialist_email=specialist.get("specialist_email"),
-                specialist_phone=specialist.get("specialist_phone"),
-                is_lps=specialist.get("is_lps"),
-                source="lookup_town",
+    args = _extract_args(body)
+    # `town_name` is the parameter name in the Retell tool schema (see
+    # retell_mfc_config.json + the v11 prompt's tool table); the rest are
+    # accepted defensively in case the dashboard config drifts.
+    town = (args.get("town_name", "") or args.get("town", "")
+            or args.get("location", "") or args.get("city", ""))
+    # Optional — used only when the town itself isn't in our map, so a
+    # caller who names their county still routes in one lookup.
+    county = args.get("county", "") or ""
+
+    phone = call.from_number
+    # Widget calls (no from_number) still get per-call specialist recovery
+    # in schedule_callback via the widget_{call_id} key.
+    caller_key = call.caller_key
+
+    logger.info(f"[LOOKUP_TOWN] Searching for: '{town}' (county={county!r})")
+
+    specialist = await lookup_specialist_by_town(town, county=county)
+    # What the agent reads back — the town if we got one, else the county.
+    town = town or county
+
+    if specialist:
+        # Zep memory is phone-keyed — widget callers have no Zep record.
+        # Fire-and-forget: the Zep metadata PATCH (one merging request)
+        # can still take seconds on a slow Zep day, and the caller is
+        # sitting in silence waiting for this tool to answer. The save only
+        # benefits FUTURE calls.
+        if phone:
+            user_id = caller_user_id(phone)
+            _fire_and_forget(
+                zep_update_user_metadata(user_id, {
+                    "specialist": specialist["specialist_name"],
+                    "location": specialist.get("territory", town)
+                }),
+                label=f"lookup_town_zep_save({redact_phone(phone)})",
             )
 
-            # Tell the agent whether this specialist is live-transfer eligible so it
-            # can pick between transfer_call_tool and schedule_callback. Non-LPS
-            # staff (managers, operations) should never be live-transferred.
-            if specialist.get("is_lps"):
-                result = (
-                    f"{specialist['specialist_name']} handles {town}. "
-                    f"They take live transfers — offer the caller a transfer or a message."
-                )
-            else:
-                role_phrase = f" ({specialist.get('role')})" if specialist.get("role") else ""
-                result = (
-                    f"{specialist['specialist_name']}{role_phrase} covers {town}, "
-                    f"but they don't take live calls — offer to take a message and email it to them."
-                )
-            logger.info(
-                f"[LOOKUP_TOWN] Found: {specialist['specialist_name']} "
-                f"(is_lps={specialist.get('is_lps')}), saved to Zep"
+        # Stash for schedule_callback's fallback. If the caller later
+        # says "leave a message" without the agent passing specialist
+        # info, schedule_callback pulls from here so the email actually
+        # routes to the right person.
+        _stash_recent_specialist(
+            caller_key,
+            specialist_id=specialist.get("id"),
+            specialist_name=specialist.get("specialist_name"),
+            specialist_email=specialist.get("specialist_email"),
+            specialist_phone=specialist.get("specialist_phone"),
+            is_lps=specialist.get("is_lps"),
+            source="lookup_town",
+        )
+
+        # Tell the agent whether this specialist is live-transfer eligible so it
+        # can pick between transfer_call_tool and schedule_callback. Non-LPS
+        # staff (managers, operations) should never be live-transferred.
+        if specialist.get("is_lps"):
+            result = (
+                f"{specialist['specialist_name']} handles {town}. "
+                f"They take live transfers — offer the caller a transfer or a message."
             )
         else:
-            result = f"No specialist found for {town}. Contact our main office at {MFC_MAIN_OFFICE_PHONE}."
-            logger.info(f"[LOOKUP_TOWN] No match for '{town}'")
-
-        return JSONResponse(content={
-            "result": result,
-            "success": bool(specialist),
-            "is_lps": bool(specialist and specialist.get("is_lps")),
-            "specialist_id": specialist.get("id") if specialist else None,
-            "specialist_name": specialist.get("specialist_name") if specialist else None,
-            "specialist_email": specialist.get("specialist_email") if specialist else None,
-        })
-    except Exception as e:
-        logger.error(f"[LOOKUP_TOWN] Error: {e}", exc_info=True)
-        return JSONResponse(status_code=500, content={"error": "internal error"})
+            role_phrase = f" ({specialist.get('role')})" if specialist.get("role") else ""
+            result = (
+                f"{specialist['specialist_name']}{role_phrase} covers {town}, "
+                f"but they don't take live calls — offer to take a message and email it to them."
+            )
+        logger.info(
+            f"[LOOKUP_TOWN] Found: {specialist['specialist_name']} "
+            f"(is_lps={specialist.get('is_lps')}), saved to Zep"
+        )
+    else:
+        result = f"No specialist found for {town}. Contact our main office at {MFC_MAIN_OFFICE_PHONE}."
+        logger.info(f"[LOOKUP_TOWN] No match for '{town}'")
+
+    return ORJSONResponse(content={
+        "result": result,
+        "success": bool(specialist),
+        "is_lps": bool(specialist and specialist.get("is_lps")),
+        "specialist_id": specialist.get("id") if specialist else None,
+        "specialist_name": specialist.get("specialist_name") if specialist else None,
+        "specialist_email": specialist.get("specialist_email") if specialist else None,
+    })
 
 
 @app.post("/retell/functions/schedule_callback")
-async def schedule_callback(request: Request):
+@retell_function("SCHEDULE_CALLBACK")
+@idempotent_tool("schedule_callback")
+async def schedule_callback(body: dict, call: RetellCall):
     """
     Schedule a callback OR leave a message for a specific staff member.
 
@@ -1312,272 +1532,265 @@ async def schedule_callback(request: Request):
     Both shapes write to the `callbacks` table (NOT `leads`). If a specialist
     email is present, the message is immediately sent via Resend.
     """
-    ok, _raw, body = await read_and_verify(request)
-    if not ok:
-        return unauthorized_response()
-    try:
-        args = _extract_args(body)
-        call_data = body.get("call", {}) or {}
-
-        caller_name = args.get("caller_name") or args.get("name", "")
-        caller_phone = args.get("phone") or call_data.get("from_number", "")
-
-        # Cache key mirrors the webhooks' keying (from_number, or
-        # widget_{call_id} for widget calls). Deliberately NOT caller_phone:
-        # the agent may pass a different number in args (e.g. the caller
-        # dictated their cell), but the per-call cache is keyed by what
-        # Retell put on the wire at call_inbound.
-        call_id = call_data.get("call_id", "")
-        caller_key = call_data.get("from_number", "") or (f"widget_{call_id}" if call_id else "")
-
-        # Fallback: the agent occasionally forgets to pass caller_name even
-        # when it has it as {{name}}. Reach into the per-call cache populated
-        # at call_inbound (Zep lookup) so messages don't end up labeled
-        # "unknown" when we already know who's calling.
-        if not caller_name and caller_key:
-            cached = _cache_get(caller_key)
-            if cached:
-                caller_name = cached.get("caller_name") or ""
-
-        reason = (args.get("reason") or "callback").strip().lower()
-        callback_time = args.get("callback_time", "")
-        callback_date = args.get("callback_date", "")
-        callback_timeframe = args.get("callback_timeframe", "")
-        territory_id = args.get("territory_id", "")
-        message_content = args.get("message_content") or args.get("notes", "")
-
-        specialist_id = args.get("specialist_id")
-        specialist_name = args.get("specialist_name")
-        specialist_email = args.get("specialist_email")
-
-        # === Layer 0a — never trust an email address from the LLM's args. ===
-        # Everything in `args` is model output; a caller could talk the agent
-        # into "emailing the message" to an arbitrary outside address, which would
-        # go out from our verified domain. Only honor an arg-supplied email if
-        # it matches an active row in the specialists table — otherwise drop
-        # it and let the layers below resolve the recipient from the DB.
-        if specialist_email:
-            verified = await get_specialist_by_email(specialist_email)
-            if verified:
-                specialist_id = specialist_id or verified.get("id")
-                specialist_name = specialist_name or verified.get("full_name")
-                specialist_email = verified.get("email")
-            else:
-                logger.warning(
-                    f"[SCHEDULE_CALLBACK] Dropping arg-supplied email that "
-                    f"matches no active specialist: {specialist_email!r}"
-                )
-                specialist_email = None
-
-        # === Layer 0b — a name without an email gets resolved by NAME. ===
-        # The agent often passes specialist_name but forgets the email. The
-        # named person is who the caller asked for — look THEM up before
-        # falling back to whoever happens to be in the per-call cache
-        # (which may be a different person from an earlier lookup_town).
-        if specialist_name and not specialist_email:
-            named = await lookup_staff_by_name(specialist_name)
-            if len(named) == 1:
-                specialist_id = specialist_id or named[0].get("id")
-                specialist_name = named[0].get("full_name") or specialist_name
-                specialist_email = named[0].get("email")
-                logger.info(
-                    f"[SCHEDULE_CALLBACK] Resolved passed specialist_name to "
-                    f"{specialist_name} <{specialist_email}>"
-                )
-            elif len(named) > 1:
-                logger.warning(
-                    f"[SCHEDULE_CALLBACK] specialist_name {specialist_name!r} "
-                    f"matched {len(named)} people — not auto-picking"
-                )
-
-        # === Layer 1 — fill missing specialist info from the per-call cache. ===
-        # The agent frequently calls schedule_callback without specialist info,
-        # even right after lookup_town or lookup_staff_by_name returned a
-        # single matching specialist. Recover by reading the cached
-        # `recent_specialist` slot we wrote during those earlier tool calls.
-        # GUARD: if the agent named someone, only borrow the cached person's
-        # email when the names agree — otherwise a message "for Sheryl" would
-        # be emailed to whoever an earlier lookup_town resolved.
-        if not specialist_email and caller_key:
-            recent = _get_recent_specialist(caller_key)
-            if recent:
-                name_conflict = bool(
-                    specialist_name and recent.get("name")
-                    and specialist_name.strip().lower() != recent["name"].strip().lower()
-                )
-                if name_conflict:
-                    logger.warning(
-                        f"[SCHEDULE_CALLBACK] Cached specialist "
-                        f"{recent.get('name')!r} != requested "
-                        f"{specialist_name!r} — not borrowing cached email"
-                    )
-                else:
-                    specialist_id = specialist_id or recent.get("id")
-                    specialist_name = specialist_name or recent.get("name")
-                    specialist_email = specialist_email or recent.get("email")
-                    if specialist_email:
-                        logger.info(
-                            f"[SCHEDULE_CALLBACK] Filled specialist from cached "
-                            f"{recent.get('source')} lookup: "
-                            f"{specialist_name} <{specialist_email}>"
-                        )
-
-        # === Layer 1.5 — scan the args for a named specialist. ===
-        # Even when no prior tool call cached a specialist, the message body
-        # itself often names one ("leave a message for Sheryl about X").
-        # Mine the args for capitalized name tokens and look each up. If a
-        # single unambiguous specialist matches, fill in the args from that
-        # match before falling through to catch-all.
-        if not specialist_email:
-            scanned = await _scan_args_for_specialist(args, caller_name)
-            if scanned:
-                specialist_id = specialist_id or scanned.get("id")
-                specialist_name = specialist_name or scanned.get("full_name")
-                specialist_email = scanned.get("email")
-                # Stash for future tool calls in this same call session
-                if caller_key:
-                    _stash_recent_specialist(
-                        caller_key,
-                        specialist_id=scanned.get("id"),
-                        specialist_name=scanned.get("full_name"),
-                        specialist_email=scanned.get("email"),
-                        specialist_phone=scanned.get("phone"),
-                        is_lps=scanned.get("is_lps"),
-                        source="schedule_callback_scan",
-                    )
+    args = _extract_args(body)
+
+    caller_name = args.get("caller_name") or args.get("name", "")
+    caller_phone = args.get("phone") or call.from_number
+
+    # Cache key mirrors the webhooks' keying (from_number, or
+    # widget_{call_id} for widget calls). Deliberately NOT caller_phone:
+    # the agent may pass a different number in args (e.g. the caller
+    # dictated their cell), but the per-call cache is keyed by what
+    # Retell put on the wire at call_inbound.
+    caller_key = call.caller_key
+
+    # Fallback: the agent occasionally forgets to pass caller_name even
+    # when it has it as {{name}}. Reach into the per-call cache populated
+    # at call_inbound (Zep lookup) so messages don't end up labeled
+    # "unknown" when we already know who's calling.
+    if not caller_name and caller_key:
+        cached = _cache_get(caller_key)
+        if cached:
+            caller_name = cached.get("caller_name") or ""
+
+    reason = (args.get("reason") or "callback").strip().lower()
+    callback_time = args.get("callback_time", "")
+    callback_date = args.get("callback_date", "")
+    callback_timeframe = args.get("callback_timeframe", "")
+    territory_id = args.get("territory_id", "")
+    message_content = args.get("message_content") or args.get("notes", "")
+
+    specialist_id = args.get("specialist_id")
+    specialist_name = args.get("specialist_name")
+    specialist_email = args.get("specialist_email")
+
+    # === Layer 0a — never trust an email address from the LLM's args. ===
+    # Everything in `args` is model output; a caller could talk the agent
+    # into "emailing the message" to an arbitrary outside address, which would
+    # go out from our verified domain. Only honor an arg-supplied email if
+    # it matches an active row in the specialists table — otherwise drop
+    # it and let the layers below resolve the recipient from the DB.
+    if specialist_email:
+        verified = await get_specialist_by_email(specialist_email)
+        if verified:
+            specialist_id = specialist_id or verified.get("id")
+            specialist_name = specialist_name or verified.get("full_name")
+            specialist_email = verified.get("email")
+        else:
+            logger.warning(
+                f"[SCHEDULE_CALLBACK] Dropping arg-supplied email that "
+                f"matches no active specialist: {specialist_email!r}"
+            )
+            specialist_email = None
 
-        # === Layer 1.75 — store-line calls route to the store manager. ===
-        # A generic "have somebody call me" on a store's dedicated line
-        # belongs to that store's manager, not the global triage inbox.
-        if not specialist_email:
-            cached = _cache_get(caller_key) if caller_key else None
-            store_email = (cached or {}).get("store_manager_email") or ""
-            store_label = (cached or {}).get("store_name") or ""
-            if not store_email and call_data.get("to_number"):
-                store_row = await lookup_warehouse_by_did(call_data["to_number"])
-                if store_row:
-                    store_email = store_row.get("manager_email") or ""
-                    store_label = store_row.get("city") or ""
-            if store_email:
-                specialist_email = store_email
-                specialist_name = specialist_name or f"{store_label} store manager"
-                logger.info(
-                    f"[SCHEDULE_CALLBACK] No specialist resolved — store-line "
-                    f"call, routing message to {store_label} manager"
-                )
+    # === Layer 0b — a name without an email gets resolved by NAME. ===
+    # The agent often passes specialist_name but forgets the email. The
+    # named person is who the caller asked for — look THEM up before
+    # falling back to whoever happens to be in the per-call cache
+    # (which may be a different person from an earlier lookup_town).
+    if specialist_name and not specialist_email:
+        named = await lookup_staff_by_name(specialist_name)
+        if len(named) == 1:
+            specialist_id = specialist_id or named[0].get("id")
+            specialist_name = named[0].get("full_name") or specialist_name
+            specialist_email = named[0].get("email")
+            logger.info(
+                f"[SCHEDULE_CALLBACK] Resolved passed specialist_name to "
+                f"{specialist_name} <{specialist_email}>"
+            )
+        elif len(named) > 1:
+            logger.warning(
+                f"[SCHEDULE_CALLBACK] specialist_name {specialist_name!r} "
+                f"matched {len(named)} people — not auto-picking"
+            )
 
-        # === Layer 2 — catch-all so messages never reach /dev/null. ===
-        # If neither the agent's args nor the cache yielded a specialist,
-        # route to CATCHALL_MESSAGE_EMAIL (default FROM_EMAIL). Logged
-        # WARNING so ops can spot misroutes that need follow-up.
-        if not specialist_email:
-            catchall = os.getenv("CATCHALL_MESSAGE_EMAIL", FROM_EMAIL).strip()
-            if catchall:
-                specialist_email = catchall
-                specialist_name = specialist_name or "Montana Feed Team"
+    # === Layer 1 — fill missing specialist info from the per-call cache. ===
+    # The agent frequently calls schedule_callback without specialist info,
+    # even right after lookup_town or lookup_staff_by_name returned a
+    # single matching specialist. Recover by reading the cached
+    # `recent_specialist` slot we wrote during those earlier tool calls.
+    # GUARD: if the agent named someone, only borrow the cached person's
+    # email when the names agree — otherwise a message "for Sheryl" would
+    # be emailed to whoever an earlier lookup_town resolved.
+    if not specialist_email and caller_key:
+        recent = _get_recent_specialist(caller_key)
+        if recent:
+            name_conflict = bool(
+                specialist_name and recent.get("name")
+                and specialist_name.strip().lower() != recent["name"].strip().lower()
+            )
+            if name_conflict:
                 logger.warning(
-                    f"[SCHEDULE_CALLBACK] No specialist resolved (args empty, "
-                    f"cache empty) — routing to catchall {catchall}"
+                    f"[SCHEDULE_CALLBACK] Cached specialist "
+                    f"{recent.get('name')!r} != requested "
+                    f"{specialist_name!r} — not borrowing cached email"
                 )
+            else:
+                specialist_id = specialist_id or recent.get("id")
+                specialist_name = specialist_name or recent.get("name")
+                specialist_email = specialist_email or recent.get("email")
+                if specialist_email:
+                    logger.info(
+                        f"[SCHEDULE_CALLBACK] Filled specialist from cached "
+                        f"{recent.get('source')} lookup: "
+                        f"{specialist_name} <{specialist_email}>"
+                    )
 
-        # Compose a human-readable "when" line out of whatever date/time/timeframe
-        # fragments Retell supplied. Any combination is valid.
-        when_parts = [p for p in (callback_date, callback_time, callback_timeframe) if p]
-        when_str = " ".join(when_parts).strip()
-
-        # Compose the notes field: message body + any timing info we have so the
-        # specialist sees the full request in their email.
-        if reason == "message" and message_content:
-            notes = message_content
-            if when_str:
-                notes += f"\n\nRequested callback: {when_str}"
-        elif when_str:
-            notes = f"Requested callback: {when_str}"
-            if message_content:
-                notes += f"\n\n{message_content}"
-        else:
-            notes = message_content or "(no details provided)"
-
-        if territory_id:
-            notes += f"\n\n(territory_id: {territory_id})"
-
-        # Write to callbacks table via the skill function
-        callback_id = await create_message_for_specialist(
-            specialist_id=specialist_id,
-            specialist_name=specialist_name,
-            specialist_email=specialist_email,
-            caller_name=caller_name,
-            caller_phone=caller_phone,
-            message=notes,
-            reason=reason,
-        )
-
-        if not callback_id:
-            # Fallback: at least log a lead so nothing is lost
-            await capture_lead(caller_name, caller_phone, "callback", notes[:500])
-            return JSONResponse(content={
-                "result": (
-                    "I've noted your request. Our team will follow up with you at "
-                    f"{MFC_MAIN_OFFICE_PHONE} or the number you're calling from."
-                ),
-                "success": False,
-            })
+    # === Layer 1.5 — scan the args for a named specialist. ===
+    # Even when no prior tool call cached a specialist, the message body
+    # itself often names one ("leave a message for Sheryl about X").
+    # Mine the args for capitalized name tokens and look each up. If a
+    # single unambiguous specialist matches, fill in the args from that
+    # match before falling through to catch-all.
+    if not specialist_email:
+        scanned = await _scan_args_for_specialist(args, caller_name)
+        if scanned:
+            specialist_id = specialist_id or scanned.get("id")
+            specialist_name = specialist_name or scanned.get("full_name")
+            specialist_email = scanned.get("email")
+            # Stash for future tool calls in this same call session
+            if caller_key:
+                _stash_recent_specialist(
+                    caller_key,
+                    specialist_id=scanned.get("id"),
+                    specialist_name=scanned.get("full_name"),
+                    specialist_email=scanned.get("email"),
+                    specialist_phone=scanned.get("phone"),
+                    is_lps=scanned.get("is_lps"),
+                    source="schedule_callback_scan",
+                )
 
-        # Queue the email in the background — the caller is on the line
-        # waiting for this tool to answer, and a slow Resend round-trip
-        # (up to the client's 10s timeout) is dead air. Failures are logged
-        # by _fire_and_forget; the callbacks row above is the durable record
-        # either way.
-        email_queued = False
-        if specialist_email:
-            _fire_and_forget(
-                send_specialist_email(
-                    specialist_email=specialist_email,
-                    specialist_name=specialist_name or "Team",
-                    caller_name=caller_name or "Unknown caller",
-                    caller_phone=caller_phone or "unknown",
-                    caller_location="",
-                    call_summary=notes,
-                    duration=None,
-                ),
-                label=f"schedule_callback_email({specialist_email})",
+    # === Layer 1.75 — store-line calls route to the store manager. ===
+    # A generic "have somebody call me" on a store's dedicated line
+    # belongs to that store's manager, not the global triage inbox.
+    if not specialist_email:
+        cached = _cache_get(caller_key) if caller_key else None
+        store_email = (cached or {}).get("store_manager_email") or ""
+        store_label = (cached or {}).get("store_name") or ""
+        if not store_email and call.to_number:
+            store_row = await lookup_warehouse_by_did(call.to_number)
+            if store_row:
+                store_email = store_row.get("manager_email") or ""
+                store_label = store_row.get("city") or ""
+        if store_email:
+            specialist_email = store_email
+            specialist_name = specialist_name or f"{store_label} store manager"
+            logger.info(
+                f"[SCHEDULE_CALLBACK] No specialist resolved — store-line "
+                f"call, routing message to {store_label} manager"
             )
-            email_queued = True
-
-        # Build a user-facing confirmation the voice agent can speak back.
-        # Widget callers have no "number you called from" — don't claim one.
-        reach_line = (
-            "They'll reach out to you at the number you called from."
-            if caller_phone else
-            "They'll reach out using the contact info you gave me."
-        )
-        if reason == "message" and specialist_name:
-            spoken = (
-                f"Got it. I'll make sure {specialist_name} gets your message"
-                f"{' by email' if email_queued else ''}. {reach_line}"
+
+    # === Layer 2 — catch-all so messages never reach /dev/null. ===
+    # If neither the agent's args nor the cache yielded a specialist,
+    # route to CATCHALL_MESSAGE_EMAIL (default FROM_EMAIL). Logged
+    # WARNING so ops can spot misroutes that need follow-up.
+    if not specialist_email:
+        catchall = os.getenv("CATCHALL_MESSAGE_EMAIL", FROM_EMAIL).strip()
+        if catchall:
+            specialist_email = catchall
+            specialist_name = specialist_name or "Montana Feed Team"
+            logger.warning(
+                f"[SCHEDULE_CALLBACK] No specialist resolved (args empty, "
+                f"cache empty) — routing to catchall {catchall}"
             )
-        elif when_str and specialist_name:
-            spoken = f"Scheduled a callback from {specialist_name} for {when_str}."
-        elif when_str:
-            spoken = f"Scheduled your callback for {when_str}."
-        else:
-            spoken = "Your request has been noted and the team will follow up."
 
-        return JSONResponse(content={
-            "result": spoken,
-            "success": True,
-            "callback_id": callback_id,
-            # Kept as `email_sent` for any consumer parity — True means the
-            # send was dispatched to the background, not confirmed delivered.
-            "email_sent": email_queued,
+    # Compose a human-readable "when" line out of whatever date/time/timeframe
+    # fragments Retell supplied. Any combination is valid.
+    when_parts = [p for p in (callback_date, callback_time, callback_timeframe) if p]
+    when_str = " ".join(when_parts).strip()
+
+    # Compose the notes field: message body + any timing info we have so the
+    # specialist sees the full request in their email.
+    if reason == "message" and message_content:
+        notes = message_content
+        if when_str:
+            notes += f"\n\nRequested callback: {when_str}"
+    elif when_str:
+        notes = f"Requested callback: {when_str}"
+        if message_content:
+            notes += f"\n\n{message_content}"
+    else:
+        notes = message_content or "(no details provided)"
+
+    if territory_id:
+        notes += f"\n\n(territory_id: {territory_id})"
+
+    # Write to callbacks table via the skill function
+    callback_id = await create_message_for_specialist(
+        specialist_id=specialist_id,
+        specialist_name=specialist_name,
+        specialist_email=specialist_email,
+        caller_name=caller_name,
+        caller_phone=caller_phone,
+        message=notes,
+        reason=reason,
+    )
+
+    if not callback_id:
+        # Fallback: at least log a lead so nothing is lost
+        await capture_lead(caller_name, caller_phone, "callback", notes[:500])
+        return ORJSONResponse(content={
+            "result": (
+                "I've noted your request. Our team will follow up with you at "
+                f"{MFC_MAIN_OFFICE_PHONE} or the number you're calling from."
+            ),
+            "success": False,
         })
-    except Exception as e:
-        logger.error(f"[SCHEDULE_CALLBACK] Error: {e}", exc_info=True)
-        return JSONResponse(status_code=500, content={"error": "internal error"})
+
+    # Queue the email in the background — the caller is on the line
+    # waiting for this tool to answer, and a slow Resend round-trip
+    # (up to the client's 10s timeout) is dead air. Failures are logged
+    # by _fire_and_forget; the callbacks row above is the durable record
+    # either way.
+    email_queued = False
+    if specialist_email:
+        _fire_and_forget(
+            send_specialist_email(
+                specialist_email=specialist_email,
+                specialist_name=specialist_name or "Team",
+                caller_name=caller_name or "Unknown caller",
+                caller_phone=caller_phone or "unknown",
+                caller_location="",
+                call_summary=notes,
+                duration=None,
+            ),
+            label=f"schedule_callback_email({specialist_email})",
+        )
+        email_queued = True
+
+    # Build a user-facing confirmation the voice agent can speak back.
+    # Widget callers have no "number you called from" — don't claim one.
+    reach_line = (
+        "They'll reach out to you at the number you called from."
+        if caller_phone else
+        "They'll reach out using the contact info you gave me."
+    )
+    if reason == "message" and specialist_name:
+        spoken = (
+            f"Got it. I'll make sure {specialist_name} gets your message"
+            f"{' by email' if email_queued else ''}. {reach_line}"
+        )
+    elif when_str and specialist_name:
+        spoken = f"Scheduled a callback from {specialist_name} for {when_str}."
+    elif when_str:
+        spoken = f"Scheduled your callback for {when_str}."
+    else:
+        spoken = "Your request has been noted and the team will follow up."
+
+    return ORJSONResponse(content={
+        "result": spoken,
+        "success": True,
+        "callback_id": callback_id,
+        # Kept as `email_sent` for any consumer parity — True means the
+        # send was dispatched to the background, not confirmed delivered.
+        "email_sent": email_queued,
+    })
 
 
 @app.post("/retell/functions/create_lead")
-async def create_lead_endpoint(request: Request):
+@retell_function("CREATE_LEAD")
+@idempotent_tool("create_lead")
+async def create_lead_endpoint(body: dict, call: RetellCall):
     """Create a new lead record.
 
     Accepts both the historical shape (`name`, `phone`, `location`, `interests`)
@@ -1587,84 +1800,70 @@ async def create_lead_endpoint(request: Request):
     extras are folded into the lead's `primary_interest` notes so the
     specialist sees the full picture.
     """
-    ok, _raw, body = await read_and_verify(request)
-    if not ok:
-        return unauthorized_response()
-    try:
-        args = _extract_args(body)
-
-        first_name = (args.get("first_name") or "").strip()
-        last_name = (args.get("last_name") or "").strip()
-        name = (args.get("name") or "").strip()
-        if not first_name and name:
-            parts = name.split(None, 1)
-            first_name = parts[0]
-            last_name = last_name or (parts[1] if len(parts) > 1 else "")
-        display_name = f"{first_name} {last_name}".strip() or name or "Caller"
-
-        call_data = body.get("call", {}) or {}
-        phone_num = args.get("phone") or call_data.get("from_number", "")
-        location = args.get("location") or args.get("county", "")
-        primary_interest = args.get("primary_interest") or args.get("interests", "")
-
-        # Cache key mirrors the webhooks' keying so widget calls hit too.
-        lead_call_id = call_data.get("call_id", "")
-        caller_key = call_data.get("from_number", "") or (f"widget_{lead_call_id}" if lead_call_id else "")
-
-        # Same call-cache fallback as schedule_callback — if the agent didn't
-        # pass any name fields but Zep already knew the caller, use that.
-        if display_name == "Caller" and caller_key:
-            cached = _cache_get(caller_key)
-            if cached:
-                cached_name = cached.get("caller_name")
-                if cached_name:
-                    display_name = cached_name
-                    if not first_name:
-                        parts = cached_name.split(None, 1)
-                        first_name = parts[0]
-                        last_name = last_name or (parts[1] if len(parts) > 1 else "")
-
-        # Compose extras (ranch_name, herd, livestock, email, etc.) into the
-        # interest field so we don't lose them — the leads table doesn't have
-        # dedicated columns for these and we'd rather have the data in notes
-        # than discarded entirely.
-        extras = []
-        for key in ("ranch_name", "herd_size", "livestock_type", "zip_code", "email", "specialist_name"):
-            val = args.get(key)
-            if val:
-                extras.append(f"{key}={val}")
-        if extras:
-            primary_interest = (primary_interest + " | " if primary_interest else "") + " ".join(extras)
-
-        success = await capture_lead(display_name, phone_num, location, primary_interest)
-        result = f"Saved your info, {display_name}." if success else "Noted your information."
-
-        return JSONResponse(content={"result": result, "success": success})
-    except Exception as e:
-        logger.error(f"[CREATE_LEAD] Error: {e}", exc_info=True)
-        return JSONResponse(status_code=500, content={"error": "internal error"})
+    args = _extract_args(body)
+
+    first_name = (args.get("first_name") or "").strip()
+    last_name = (args.get("last_name") or "").strip()
+    name = (args.get("name") or "").strip()
+    if not first_name and name:
+        parts = name.split(None, 1)
+        first_name = parts[0]
+        last_name = last_name or (parts[1] if len(parts) > 1 else "")
+    display_name = f"{first_name} {last_name}".strip() or name or "Caller"
+
+    phone_num = args.get("phone") or call.from_number
+    location = args.get("location") or args.get("county", "")
+    primary_interest = args.get("primary_interest") or args.get("interests", "")
+
+    # Cache key mirrors the webhooks' keying so widget calls hit too.
+    caller_key = call.caller_key
+
+    # Same call-cache fallback as schedule_callback — if the agent didn't
+    # pass any name fields but Zep already knew the caller, use that.
+    if display_name == "Caller" and caller_key:
+        cached = _cache_get(caller_key)
+        if cached:
+            cached_name = cached.get("caller_name")
+            if cached_name:
+                display_name = cached_name
+                if not first_name:
+                    parts = cached_name.split(None, 1)
+                    first_name = parts[0]
+                    last_name = last_name or (parts[1] if len(parts) > 1 else "")
+
+    # Compose extras (ranch_name, herd, livestock, email, etc.) into the
+    # interest field so we don't lose them — the leads table doesn't have
+    # dedicated columns for these and we'd rather have the data in notes
+    # than discarded entirely.
+    extras = []
+    for key in ("ranch_name", "herd_size", "livestock_type", "zip_code", "email", "specialist_name"):
+        val = args.get(key)
+        if val:
+            extras.append(f"{key}={val}")
+    if extras:
+        primary_interest = (primary_interest + " | " if primary_interest else "") + " ".join(extras)
+
+    success = await capture_lead(display_name, phone_num, location, primary_interest)
+    result = f"Saved your info, {display_name}." if success else "Noted your information."
+
+    return ORJSONResponse(content={"result": result, "success": success})
 
 
 @app.post("/retell/functions/search_knowledge_base")
-async def search_knowledge_base_endpoint(request: Request):
+@retell_function("KB_SEARCH")
+async def search_knowledge_base_endpoint(body: dict, call: RetellCall):
     """Search the knowledge base for relevant information."""
-    ok, _raw, body = await read_and_verify(request)
-    if not ok:
-        return unauthorized_response()
-    try:
-        args = _extract_args(body)
-        # `query` per the v11 prompt; `question` was the old query_knowledge
-        # tool's param name — accept both so a stale dashboard config still works.
-        query = args.get("query", "") or args.get("question", "")
-        result = await search_knowledge_base(query)
-        return JSONResponse(content={"result": result, "success": True})
-    except Exception as e:
-        logger.error(f"[KB_SEARCH] Error: {e}", exc_info=True)
-        return JSONResponse(status_code=500, content={"error": "internal error"})
+    args = _extract_args(body)
+    # `query` per the v11 prompt; `question` was the old query_knowledge
+    # tool's param name — accept both so a stale dashboard config still works.
+    query = args.get("query", "") or args.get("question", "")
+    result = await search_knowledge_base(query)
+    return ORJSONResponse(content={"result": result, "success": True})
 
 
 @app.post("/retell/functions/get_warehouse")
-async def get_warehouse_endpoint(request: Request):
+@retell_function("GET_WAREHOUSE")
+async def get_warehouse_endpoint(body: dict, call: RetellCall):
     """Look up a Montana Feed store/warehouse and report its hours + address.
 
     Moved off Vercel (mfcagent.vercel.app/api/get-warehouse) to Railway on
@@ -1675,209 +1874,151 @@ async def get_warehouse_endpoint(request: Request):
     Accepts whichever location hint the caller gives: city, warehouse_code,
     region, county, town, or a generic `location`/`query`. Matches flexibly.
     """
-    ok, _raw, body = await read_and_verify(request)
-    if not ok:
-        return unauthorized_response()
-    try:
-        args = _extract_args(body)
-        terms = []
-        for key in ("city", "warehouse_code", "region", "county",
-                    "location", "town", "name", "query", "store"):
-            v = args.get(key)
-            if v and isinstance(v, str):
-                terms.append(v)
-
-        logger.info(f"[GET_WAREHOUSE] terms={terms}")
-
-        if not terms:
-            return JSONResponse(content={
-                "result": (
-                    "We have five locations — Dillon, Miles City, Lewistown, "
-                    "Columbus, and Riverton. Which one would you like the hours "
-                    "or address for?"
-                ),
-                "success": False,
-            })
+    args = _extract_args(body)
+    terms = []
+    for key in ("city", "warehouse_code", "region", "county",
+                "location", "town", "name", "query", "store"):
+        v = args.get(key)
+        if v and isinstance(v, str):
+            terms.append(v)
+
+    logger.info(f"[GET_WAREHOUSE] terms={terms}")
+
+    if not terms:
+        return _canned(_WAREHOUSE_NO_TERMS_BODY)
+
+    w = await lookup_warehouse(terms)
+
+    if not w:
+        return _canned(_WAREHOUSE_NO_MATCH_BODY)
+
+    city = w.get("city") or w.get("warehouse_name") or "that location"
+    hours = w.get("operating_hours") or "by appointment — call ahead"
+    spoken = f"Our {city} store is open {hours}."
+    if w.get("address"):
+        spoken += f" It's located at {w['address']}."
+    if w.get("phone"):
+        spoken += f" You can reach it at {w['phone']}."
+    if w.get("manager_name"):
+        spoken += f" The store manager is {w['manager_name']}."
+    if w.get("service_area_description"):
+        spoken += f" {w['service_area_description']}"
+
+    logger.info(f"[GET_WAREHOUSE] matched {w.get('warehouse_name')}")
+    return ORJSONResponse(content={
+        "result": spoken,
+        "success": True,
+        "warehouse_name": w.get("warehouse_name"),
+        "warehouse_code": w.get("warehouse_code"),
+        "city": w.get("city"),
+        "operating_hours": w.get("operating_hours"),
+        "address": w.get("address"),
+        "phone": w.get("phone"),
+        "manager_name": w.get("manager_name"),
+    })
+
+
+# Per-product fields echoed back to Retell alongside the spoken summary.
+_SEARCH_PRODUCT_FIELDS = (
+    "product_name", "product_code", "brand", "category",
+    "protein_percentage", "unit_type", "in_stock",
+)
+_RECOMMEND_PRODUCT_FIELDS = (
+    "product_name", "product_code", "category", "protein_percentage", "unit_type",
+)
 
-        w = await lookup_warehouse(terms)
 
-        if not w:
-            return JSONResponse(content={
-                "result": (
-                    f"I couldn't match that to one of our stores. We have "
-                    f"locations in Dillon, Miles City, Lewistown, Columbus, and "
-                    f"Riverton. You can also reach our main office at "
-                    f"{MFC_MAIN_OFFICE_PHONE}."
-                ),
-                "success": False,
-            })
+def _products_response(results: list, *, single: str, multiple: str,
+                       fields: tuple) -> ORJSONResponse:
+    """Shared success reply for search_products / get_recommendations: one
+    spoken sentence built from `_format_product`, plus the matched rows
+    trimmed to `fields`. `single` / `multiple` are the sentence lead-ins."""
+    lines = [_format_product(p) for p in results]
+    if len(lines) == 1:
+        spoken = f"{single} {lines[0]}."
+    else:
+        spoken = f"{multiple} " + "; ".join(lines) + "."
 
-        city = w.get("city") or w.get("warehouse_name") or "that location"
-        hours = w.get("operating_hours") or "by appointment — call ahead"
-        spoken = f"Our {city} store is open {hours}."
-        if w.get("address"):
-            spoken += f" It's located at {w['address']}."
-        if w.get("phone"):
-            spoken += f" You can reach it at {w['phone']}."
-        if w.get("manager_name"):
-            spoken += f" The store manager is {w['manager_name']}."
-        if w.get("service_area_description"):
-            spoken += f" {w['service_area_description']}"
-
-        logger.info(f"[GET_WAREHOUSE] matched {w.get('warehouse_name')}")
-        return JSONResponse(content={
-            "result": spoken,
-            "success": True,
-            "warehouse_name": w.get("warehouse_name"),
-            "warehouse_code": w.get("warehouse_code"),
-            "city": w.get("city"),
-            "operating_hours": w.get("operating_hours"),
-            "address": w.get("address"),
-            "phone": w.get("phone"),
-            "manager_name": w.get("manager_name"),
-        })
-    except Exception as e:
-        logger.error(f"[GET_WAREHOUSE] Error: {e}", exc_info=True)
-        return JSONResponse(status_code=500, content={"error": "internal error"})
+    return ORJSONResponse(content={
+        "result": spoken,
+        "success": True,
+        "match_count": len(results),
+        "products": [{f: p.get(f) for f in fields} for p in results],
+    })
 
 
 @app.post("/retell/functions/search_products")
-async def search_products_endpoint(request: Request):
+@retell_function("SEARCH_PRODUCTS")
+async def search_products_endpoint(body: dict, call: RetellCall):
     """Search the product catalog by name / category / livestock type.
 
     Moved off Vercel to Railway 2026-06-05 (same nested-args bug). Reads args
     via `_extract_args`.
     """
-    ok, _raw, body = await read_and_verify(request)
-    if not ok:
-        return unauthorized_response()
-    try:
-        args = _extract_args(body)
-        query = (args.get("query") or args.get("product") or args.get("search") or "").strip()
-        category = (args.get("category") or "").strip()
-        livestock_type = (args.get("livestock_type") or args.get("animal") or "").strip()
-
-        logger.info(
-            f"[SEARCH_PRODUCTS] query={query!r} category={category!r} "
-            f"livestock_type={livestock_type!r}"
-        )
-
-        results = await search_products(
-            query=query, category=category, livestock_type=livestock_type
-        )
+    args = _extract_args(body)
+    query = (args.get("query") or args.get("product") or args.get("search") or "").strip()
+    category = (args.get("category") or "").strip()
+    livestock_type = (args.get("livestock_type") or args.get("animal") or "").strip()
+
+    logger.info(
+        f"[SEARCH_PRODUCTS] query={query!r} category={category!r} "
+        f"livestock_type={livestock_type!r}"
+    )
 
-        if not results:
-            return JSONResponse(content={
-                "result": (
-                    "I didn't find a match for that in our catalog. We carry "
-                    "Purina and Montana Feed Company minerals, protein "
-                    "supplements, range cubes, complete feeds, grains, and "
-                    "supplement tubs — want me to have a specialist follow up?"
-                ),
-                "success": False,
-                "match_count": 0,
-            })
+    results = await search_products(
+        query=query, category=category, livestock_type=livestock_type
+    )
 
-        from skills.products import _format_product
-        lines = [_format_product(p) for p in results]
-        if len(lines) == 1:
-            spoken = f"We carry {lines[0]}."
-        else:
-            spoken = "Here's what we carry that fits: " + "; ".join(lines) + "."
+    if not results:
+        return _canned(_PRODUCTS_NO_MATCH_BODY)
 
-        return JSONResponse(content={
-            "result": spoken,
-            "success": True,
-            "match_count": len(results),
-            "products": [
-                {
-                    "product_name": p.get("product_name"),
-                    "product_code": p.get("product_code"),
-                    "brand": p.get("brand"),
-                    "category": p.get("category"),
-                    "protein_percentage": p.get("protein_percentage"),
-                    "unit_type": p.get("unit_type"),
-                    "in_stock": p.get("in_stock"),
-                }
-                for p in results
-            ],
-        })
-    except Exception as e:
-        logger.error(f"[SEARCH_PRODUCTS] Error: {e}", exc_info=True)
-        return JSONResponse(status_code=500, content={"error": "internal error"})
+    return _products_response(
+        results,
+        single="We carry",
+        multiple="Here's what we carry that fits:",
+        fields=_SEARCH_PRODUCT_FIELDS,
+    )
 
 
 @app.post("/retell/functions/get_recommendations")
-async def get_recommendations_endpoint(request: Request):
+@retell_function("GET_RECOMMENDATIONS")
+async def get_recommendations_endpoint(body: dict, call: RetellCall):
     """Recommend products for a described need (winter feeding, breeding
     minerals, fly control, weaning stress, etc.).
 
     Moved off Vercel to Railway 2026-06-05 (same nested-args bug). Reads args
     via `_extract_args`.
     """
-    ok, _raw, body = await read_and_verify(request)
-    if not ok:
-        return unauthorized_response()
-    try:
-        args = _extract_args(body)
-        livestock_type = (args.get("livestock_type") or args.get("animal") or "").strip()
-        need = (args.get("need") or args.get("goal") or args.get("query")
-                or args.get("interest") or "").strip()
-
-        logger.info(f"[GET_RECOMMENDATIONS] livestock_type={livestock_type!r} need={need!r}")
-
-        results = await recommend_products(livestock_type=livestock_type, need=need)
-
-        if not results:
-            return JSONResponse(content={
-                "result": (
-                    "I'd want a livestock specialist to point you to the right "
-                    "product for that. Can I take your info and have one reach "
-                    "out, or is there a specific category you're after — minerals, "
-                    "protein supplements, or complete feeds?"
-                ),
-                "success": False,
-                "match_count": 0,
-            })
+    args = _extract_args(body)
+    livestock_type = (args.get("livestock_type") or args.get("animal") or "").strip()
+    need = (args.get("need") or args.get("goal") or args.get("query")
+            or args.get("interest") or "").strip()
 
-        from skills.products import _format_product
-        lines = [_format_product(p) for p in results]
-        if len(lines) == 1:
-            spoken = f"For that, I'd suggest {lines[0]}."
-        else:
-            spoken = "A few good options for that: " + "; ".join(lines) + "."
+    logger.info(f"[GET_RECOMMENDATIONS] livestock_type={livestock_type!r} need={need!r}")
 
-        return JSONResponse(content={
-            "result": spoken,
-            "success": True,
-            "match_count": len(results),
-            "products": [
-                {
-                    "product_name": p.get("product_name"),
-                    "product_code": p.get("product_code"),
-                    "category": p.get("category"),
-                    "protein_percentage": p.get("protein_percentage"),
-                    "unit_type": p.get("unit_type"),
-                }
-                for p in results
-            ],
-        })
-    except Exception as e:
-        logger.error(f"[GET_RECOMMENDATIONS] Error: {e}", exc_info=True)
-        return JSONResponse(status_code=500, content={"error": "internal error"})
+    results = await recommend_products(livestock_type=livestock_type, need=need)
+
+    if not results:
+        return _canned(_RECOMMENDATIONS_NO_MATCH_BODY)
+
+    return _products_response(
+        results,
+        single="For that, I'd suggest",
+        multiple="A few good options for that:",
+        fields=_RECOMMEND_PRODUCT_FIELDS,
+    )
 
 
 @app.post("/retell/functions/end_call")
-async def end_call(request: Request):
+@retell_function("END_CALL")
+async def end_call(_body: dict, _call: RetellCall):
     """End the call gracefully."""
-    ok, _raw, _body = await read_and_verify(request)
-    if not ok:
-        return unauthorized_response()
-    return JSONResponse(content={"result": "Thanks for calling Montana Feed!", "success": True})
+    return _canned(_END_CALL_BODY)
 
 
 @app.post("/retell/functions/lookup_staff")
-async def lookup_staff(request: Request):
+@retell_function("LOOKUP_STAFF")
+async def lookup_staff(body: dict, call: RetellCall):
     """
     Legacy endpoint — misnamed. Historically this took a `location` arg and
     called `lookup_specialist_by_town`. Kept for backwards compatibility with
@@ -1885,33 +2026,32 @@ async def lookup_staff(request: Request):
     should prefer `lookup_staff_by_name` for actual name-based requests and
     `lookup_town` for territorial routing.
     """
-    ok, _raw, body = await read_and_verify(request)
-    if not ok:
-        return unauthorized_response()
-    try:
-        location = _extract_args(body).get("location", "")
-        phone = body.get("call", {}).get("from_number", "")
+    location = _extract_args(body).get("location", "")
+    phone = call.from_number
 
-        specialist = await lookup_specialist_by_town(location)
+    specialist = await lookup_specialist_by_town(location)
 
-        if specialist and phone:
-            user_id = f"caller_{normalize_phone(phone)}"
-            await zep_update_user_metadata(user_id, {
+    if specialist and phone:
+        # Same as lookup_town: the Zep save only helps future calls, so it
+        # runs in the background instead of holding this tool's answer.
+        user_id = caller_user_id(phone)
+        _fire_and_forget(
+            zep_update_user_metadata(user_id, {
                 "specialist": specialist["specialist_name"],
                 "location": specialist.get("territory", location)
-            })
-            result = f"Your specialist is {specialist['specialist_name']} at {specialist['specialist_phone']}."
-        else:
-            result = f"Let me connect you with our main office at {MFC_MAIN_OFFICE_PHONE}."
+            }),
+            label=f"lookup_staff_zep_save({redact_phone(phone)})",
+        )
+        result = f"Your specialist is {specialist['specialist_name']} at {specialist['specialist_phone']}."
+    else:
+        result = f"Let me connect you with our main office at {MFC_MAIN_OFFICE_PHONE}."
 
-        return JSONResponse(content={"result": result, "success": bool(specialist)})
-    except Exception as e:
-        logger.error(f"[LOOKUP_STAFF] Error: {e}", exc_info=True)
-        return JSONResponse(status_code=500, content={"error": "internal error"})
+    return ORJSONResponse(content={"result": result, "success": bool(specialist)})
 
 
 @app.post("/retell/functions/lookup_staff_by_name")
-async def lookup_staff_by_name_endpoint(request: Request):
+@retell_function("LOOKUP_STAFF_BY_NAME")
+async def lookup_staff_by_name_endpoint(body: dict, call: RetellCall):
     """
     Look up a staff member by name. Handles single names ("Sheryl"),
     full names ("Sheryl Shea"), or partials ("shea"). Returns structured
@@ -1944,271 +2084,246 @@ async def lookup_staff_by_name_endpoint(request: Request):
                               * leave a message otherwise (via schedule_callback)
       - match_count >= 2  -> ask caller to clarify (first name only + last name)
     """
-    ok, _raw, body = await read_and_verify(request)
-    if not ok:
-        return unauthorized_response()
-    try:
-        # Defensive arg parsing: Retell sends function arguments as the top-level
-        # body (with an `execution_message` field alongside), NOT wrapped in an
-        # `arguments` key. Fall back to both to be robust against either format.
-        args = _extract_args(body)
-        name_query = (args.get("name") or "").strip()
-
-        # Always log the raw body at INFO so we can diagnose future failures
-        # without needing to re-reproduce the exact call.
-        logger.info(f"[LOOKUP_STAFF_BY_NAME] raw body keys: {list(body.keys())}, name='{name_query}'")
-
-        if not name_query:
-            logger.warning(f"[LOOKUP_STAFF_BY_NAME] empty name_query, body={body}")
-            return JSONResponse(content={
-                "result": "I need a name to search for. Who are you trying to reach?",
-                "success": False,
-                "match_count": 0,
-                "matches": [],
-                "main_office": MFC_MAIN_OFFICE_PHONE,
-            })
-
-        # First pass: try the exact query as given
-        matches = await lookup_staff_by_name(name_query)
-
-        # Fallback: if a multi-word query returns zero, the ASR probably mis-heard
-        # part of the name (e.g. "Cheryl Shea" instead of "Sheryl Shea"). Retry
-        # with each token individually and merge results. This is forgiving of
-        # partial matches without losing correctness — if both tokens happened to
-        # match different people, we return both and the agent asks to clarify.
-        if not matches:
-            tokens = [t.strip() for t in name_query.split() if len(t.strip()) >= 3]
-            if len(tokens) >= 2:
-                logger.info(f"[LOOKUP_STAFF_BY_NAME] zero matches for '{name_query}', retrying tokens: {tokens}")
-                seen_ids = set()
-                merged = []
-                for tok in tokens:
-                    for m in await lookup_staff_by_name(tok):
-                        if m.get("id") not in seen_ids:
-                            seen_ids.add(m.get("id"))
-                            merged.append(m)
-                matches = merged
-                logger.info(f"[LOOKUP_STAFF_BY_NAME] token fallback found {len(matches)} match(es)")
-
-        # Trim / sanitize for the voice agent — don't ship phone/email in the
-        # spoken summary by default, but DO include them in the structured data
-        # so the agent can act on them.
-        #
-        # Phone policy: the live Retell transfer tool uses an INFERRED
-        # destination — the LLM picks the number from conversation context,
-        # i.e. from this response. So (a) phones must be E.164 or the dialer
-        # chokes, and (b) non-LPS staff get NO phone here at all: they are
-        # message-only, and omitting the number is the only server-side way
-        # to stop an inferred transfer from dialing their personal cell.
-        cleaned = []
-        for m in matches:
-            lps = bool(m.get("is_lps"))
-            cleaned.append({
-                "id": m.get("id"),
-                "full_name": m.get("full_name"),
-                "role": m.get("role"),
-                "email": m.get("email"),
-                "phone": _to_e164(m.get("phone")) if lps else None,
-                "is_lps": lps,
-                "specialties": m.get("specialties") or [],
-            })
+    # Defensive arg parsing: Retell sends function arguments as the top-level
+    # body (with an `execution_message` field alongside), NOT wrapped in an
+    # `arguments` key. Fall back to both to be robust against either format.
+    args = _extract_args(body)
+    name_query = (args.get("name") or "").strip()
+
+    # Always log the raw body at INFO so we can diagnose future failures
+    # without needing to re-reproduce the exact call.
+    logger.info(f"[LOOKUP_STAFF_BY_NAME] raw body keys: {list(body.keys())}, name='{name_query}'")
+
+    if not name_query:
+        logger.warning(f"[LOOKUP_STAFF_BY_NAME] empty name_query, body={body}")
+        return _canned(_STAFF_NAME_MISSING_BODY)
+
+    # First pass: try the exact query as given
+    matches = await lookup_staff_by_name(name_query)
+
+    # Fallback: if a multi-word query returns zero, the ASR probably mis-heard
+    # part of the name (e.g. "Cheryl Shea" instead of "Sheryl Shea"). Retry
+    # with each token individually and merge results. This is forgiving of
+    # partial matches without losing correctness — if both tokens happened to
+    # match different people, we return both and the agent asks to clarify.
+    if not matches:
+        tokens = [t.strip() for t in name_query.split() if len(t.strip()) >= 3]
+        if len(tokens) >= 2:
+            logger.info(f"[LOOKUP_STAFF_BY_NAME] zero matches for '{name_query}', retrying tokens: {tokens}")
+            seen_ids = set()
+            merged = []
+            for tok in tokens:
+                for m in await lookup_staff_by_name(tok):
+                    if m.get("id") not in seen_ids:
+                        seen_ids.add(m.get("id"))
+                        merged.append(m)
+            matches = merged
+            logger.info(f"[LOOKUP_STAFF_BY_NAME] token fallback found {len(matches)} match(es)")
+
+    # Trim / sanitize for the voice agent — don't ship phone/email in the
+    # spoken summary by default, but DO include them in the structured data
+    # so the agent can act on them.
+    #
+    # Phone policy: the live Retell transfer tool uses an INFERRED
+    # destination — the LLM picks the number from conversation context,
+    # i.e. from this response. So (a) phones must be E.164 or the dialer
+    # chokes, and (b) non-LPS staff get NO phone here at all: they are
+    # message-only, and omitting the number is the only server-side way
+    # to stop an inferred transfer from dialing their personal cell.
+    cleaned = []
+    for m in matches:
+        lps = bool(m.get("is_lps"))
+        cleaned.append({
+            "id": m.get("id"),
+            "full_name": m.get("full_name"),
+            "role": m.get("role"),
+            "email": m.get("email"),
+            "phone": _to_e164(m.get("phone")) if lps else None,
+            "is_lps": lps,
+            "specialties": m.get("specialties") or [],
+        })
 
-        count = len(cleaned)
-
-        # Stash a single, unambiguous match into the per-call cache so
-        # schedule_callback can fill missing args from it if the agent
-        # later fires the tool without specialist info. We deliberately
-        # do NOT stash when count != 1: zero matches means "we don't
-        # know who they want" and 2+ means "agent should clarify with
-        # the caller" — auto-picking from those would route messages
-        # to the wrong person.
-        call_data = body.get("call", {}) or {}
-        staff_call_id = call_data.get("call_id", "")
-        # Mirror the webhooks' cache keying so widget calls stash too.
-        caller_key_for_cache = call_data.get("from_number", "") or (
-            f"widget_{staff_call_id}" if staff_call_id else ""
+    count = len(cleaned)
+
+    # Stash a single, unambiguous match into the per-call cache so
+    # schedule_callback can fill missing args from it if the agent
+    # later fires the tool without specialist info. We deliberately
+    # do NOT stash when count != 1: zero matches means "we don't
+    # know who they want" and 2+ means "agent should clarify with
+    # the caller" — auto-picking from those would route messages
+    # to the wrong person.
+    # Mirror the webhooks' cache keying so widget calls stash too.
+    caller_key_for_cache = call.caller_key
+    if count == 1 and caller_key_for_cache:
+        m = cleaned[0]
+        _stash_recent_specialist(
+            caller_key_for_cache,
+            specialist_id=m.get("id"),
+            specialist_name=m.get("full_name"),
+            specialist_email=m.get("email"),
+            specialist_phone=m.get("phone"),
+            is_lps=m.get("is_lps"),
+            source=f"lookup_staff_by_name('{name_query}')",
         )
-        if count == 1 and caller_key_for_cache:
-            m = cleaned[0]
-            _stash_recent_specialist(
-                caller_key_for_cache,
-                specialist_id=m.get("id"),
-                specialist_name=m.get("full_name"),
-                specialist_email=m.get("email"),
-                specialist_phone=m.get("phone"),
-                is_lps=m.get("is_lps"),
-                source=f"lookup_staff_by_name('{name_query}')",
-            )
 
-        if count == 0:
+    if count == 0:
+        spoken = (
+            f"I can't find anyone matching '{name_query}' in our directory. "
+            f"Would you like me to connect you with our main office at "
+            f"{MFC_MAIN_OFFICE_PHONE}?"
+        )
+    elif count == 1:
+        m = cleaned[0]
+        if m["is_lps"]:
             spoken = (
-                f"I can't find anyone matching '{name_query}' in our directory. "
-                f"Would you like me to connect you with our main office at "
-                f"{MFC_MAIN_OFFICE_PHONE}?"
+                f"I found {m['full_name']}, {m['role']}. "
+                f"Would you like me to connect you, or take a message?"
             )
-        elif count == 1:
-            m = cleaned[0]
-            if m["is_lps"]:
-                spoken = (
-                    f"I found {m['full_name']}, {m['role']}. "
-                    f"Would you like me to connect you, or take a message?"
-                )
-            else:
-                role_phrase = f"from our {m['role']} team" if m['role'] else "on our team"
-                spoken = (
-                    f"I found {m['full_name']} {role_phrase}. "
-                    f"I can take a message and email it to them right now — "
-                    f"would you like to leave one?"
-                )
         else:
-            names = ", ".join(m["full_name"] for m in cleaned[:4])
+            role_phrase = f"from our {m['role']} team" if m['role'] else "on our team"
             spoken = (
-                f"I found {count} people matching '{name_query}': {names}. "
-                f"Which one are you trying to reach?"
+                f"I found {m['full_name']} {role_phrase}. "
+                f"I can take a message and email it to them right now — "
+                f"would you like to leave one?"
             )
+    else:
+        names = ", ".join(m["full_name"] for m in cleaned[:4])
+        spoken = (
+            f"I found {count} people matching '{name_query}': {names}. "
+            f"Which one are you trying to reach?"
+        )
 
-        return JSONResponse(content={
-            "result": spoken,
-            "success": count > 0,
-            "match_count": count,
-            "matches": cleaned,
-            "main_office": MFC_MAIN_OFFICE_PHONE,
-        })
-    except Exception as e:
-        logger.error(f"[LOOKUP_STAFF_BY_NAME] Error: {e}", exc_info=True)
-        return JSONResponse(status_code=500, content={"error": "internal error"})
+    return ORJSONResponse(content={
+        "result": spoken,
+        "success": count > 0,
+        "match_count": count,
+        "matches": cleaned,
+        "main_office": MFC_MAIN_OFFICE_PHONE,
+    })
 
 
 @app.post("/retell/functions/transfer_call_tool")
-async def transfer_call_tool(request: Request):
+@retell_function("TRANSFER")
+async def transfer_call_tool(body: dict, call: RetellCall):
     """Transfer call to specialist's phone number."""
-    ok, _raw, body = await read_and_verify(request)
-    if not ok:
-        return unauthorized_response()
-    try:
-        call_data = body.get("call", {})
-        from_number = call_data.get("from_number", "")
-        
-        is_widget = not from_number
-        caller_key = from_number or f"widget_{call_data.get('call_id', '')}"
-        logger.info(f"[TRANSFER] Transfer requested for caller: {redact_phone(caller_key)}")
-
-        # FIRST: honor a name-based lookup from earlier in this call. If the
-        # caller asked for someone by name and lookup_staff_by_name (or
-        # lookup_town) resolved exactly one person, transfer to THAT person —
-        # not whoever a fresh territory lookup happens to return. Without
-        # this, "connect me to Brady" from a caller in Kaylee's territory
-        # would dial Kaylee.
-        recent = _get_recent_specialist(caller_key)
-        if recent and recent.get("phone"):
-            if not recent.get("is_lps"):
-                logger.warning(
-                    f"[TRANSFER] REFUSED — {recent.get('name')} (from "
-                    f"{recent.get('source')}) is not an LPS. "
-                    f"Agent should take a message via schedule_callback instead."
-                )
-                return JSONResponse(content={
-                    "phone_number": MFC_MAIN_OFFICE_E164,
-                    "specialist_name": "main office",
-                    "success": False,
-                    "reason": "non_lps_specialist",
-                    "specialist_id": recent.get("id"),
-                    "specialist_name_assigned": recent.get("name"),
-                    "specialist_email": recent.get("email"),
-                    "hint": (
-                        f"{recent.get('name')} doesn't take live calls. "
-                        f"Use schedule_callback with reason='message' to leave a note instead."
-                    ),
-                })
-            dest = _to_e164(recent.get("phone"))
-            if dest:
-                logger.info(
-                    f"[TRANSFER] Transferring to {recent.get('name')} at "
-                    f"{dest} (resolved earlier via {recent.get('source')})"
-                )
-                return JSONResponse(content={
-                    "phone_number": dest,
-                    "specialist_name": recent.get("name") or "your specialist",
-                    "success": True,
-                })
+    from_number = call.from_number
+
+    is_widget = not from_number
+    caller_key = call.caller_key
+    logger.info(f"[TRANSFER] Transfer requested for caller: {redact_phone(caller_key)}")
+
+    # FIRST: honor a name-based lookup from earlier in this call. If the
+    # caller asked for someone by name and lookup_staff_by_name (or
+    # lookup_town) resolved exactly one person, transfer to THAT person —
+    # not whoever a fresh territory lookup happens to return. Without
+    # this, "connect me to Brady" from a caller in Kaylee's territory
+    # would dial Kaylee.
+    recent = _get_recent_specialist(caller_key)
+    if recent and recent.get("phone"):
+        if not recent.get("is_lps"):
             logger.warning(
-                f"[TRANSFER] Cached specialist {recent.get('name')} has an "
-                f"un-normalizable phone {recent.get('phone')!r} — falling "
-                f"through to territorial routing"
-            )
-
-        # FALLBACK: territorial routing from the caller's remembered location.
-        # Try cache first for caller info, then fall back to Zep
-        cached = _cache_get(caller_key)
-        if cached is not None:
-            memory_data = cached
-            logger.info(f"[TRANSFER] [CACHE HIT] Using cached data")
-        elif not is_widget:
-            memory_data = await lookup_caller_fast(from_number)
-        else:
-            memory_data = {"caller_location": None, "caller_specialist": None}
-
-        caller_location = memory_data.get("caller_location")
-        specialist_name = memory_data.get("caller_specialist")
-
-        logger.info(f"[TRANSFER] Caller location: {caller_location}, Specialist: {specialist_name}")
-
-        specialist = await lookup_specialist_by_town(caller_location or "")
-
-        # Refuse to live-transfer non-LPS staff (managers, operations, warehouse).
-        # The agent's prompt covers this for name-based lookups, but the
-        # transfer tool itself is the last line of defense — if a Missoula
-        # caller is routed to Sheryl Shea here and we'd happily dial her
-        # number, she'd get a live call she's not staffed to take.
-        if specialist and not specialist.get("is_lps"):
-            logger.warning(
-                f"[TRANSFER] REFUSED — {specialist.get('specialist_name')} "
-                f"(role={specialist.get('role')}) is not an LPS. "
+                f"[TRANSFER] REFUSED — {recent.get('name')} (from "
+                f"{recent.get('source')}) is not an LPS. "
                 f"Agent should take a message via schedule_callback instead."
             )
-            return JSONResponse(content={
+            return ORJSONResponse(content={
                 "phone_number": MFC_MAIN_OFFICE_E164,
                 "specialist_name": "main office",
                 "success": False,
                 "reason": "non_lps_specialist",
-                "specialist_id": specialist.get("id"),
-                "specialist_name_assigned": specialist.get("specialist_name"),
-                "specialist_email": specialist.get("specialist_email"),
+                "specialist_id": recent.get("id"),
+                "specialist_name_assigned": recent.get("name"),
+                "specialist_email": recent.get("email"),
                 "hint": (
-                    f"{specialist.get('specialist_name')} doesn't take live calls. "
+                    f"{recent.get('name')} doesn't take live calls. "
                     f"Use schedule_callback with reason='message' to leave a note instead."
                 ),
             })
+        dest = _to_e164(recent.get("phone"))
+        if dest:
+            logger.info(
+                f"[TRANSFER] Transferring to {recent.get('name')} at "
+                f"{dest} (resolved earlier via {recent.get('source')})"
+            )
+            return ORJSONResponse(content={
+                "phone_number": dest,
+                "specialist_name": recent.get("name") or "your specialist",
+                "success": True,
+            })
+        logger.warning(
+            f"[TRANSFER] Cached specialist {recent.get('name')} has an "
+            f"un-normalizable phone {recent.get('phone')!r} — falling "
+            f"through to territorial routing"
+        )
 
-        phone_number = _to_e164(specialist.get("specialist_phone")) if specialist else None
-        if phone_number:
-            specialist_name = specialist.get("specialist_name", "your specialist")
+    # FALLBACK: territorial routing from the caller's remembered location.
+    # Try cache first for caller info, then fall back to Zep
+    cached = _cache_get(caller_key)
+    if cached is not None:
+        memory_data = cached
+        logger.info(f"[TRANSFER] [CACHE HIT] Using cached data")
+    elif not is_widget:
+        memory_data = await lookup_caller_fast(from_number)
+    else:
+        memory_data = {"caller_location": None, "caller_specialist": None}
+
+    caller_location = memory_data.get("caller_location")
+    specialist_name = memory_data.get("caller_specialist")
+
+    logger.info(f"[TRANSFER] Caller location: {caller_location}, Specialist: {specialist_name}")
+
+    specialist = await lookup_specialist_by_town(caller_location or "")
+
+    # Refuse to live-transfer non-LPS staff (managers, operations, warehouse).
+    # The agent's prompt covers this for name-based lookups, but the
+    # transfer tool itself is the last line of defense — if a Missoula
+    # caller is routed to Sheryl Shea here and we'd happily dial her
+    # number, she'd get a live call she's not staffed to take.
+    if specialist and not specialist.get("is_lps"):
+        logger.warning(
+            f"[TRANSFER] REFUSED — {specialist.get('specialist_name')} "
+            f"(role={specialist.get('role')}) is not an LPS. "
+            f"Agent should take a message via schedule_callback instead."
+        )
+        return ORJSONResponse(content={
+            "phone_number": MFC_MAIN_OFFICE_E164,
+            "specialist_name": "main office",
+            "success": False,
+            "reason": "non_lps_specialist",
+            "specialist_id": specialist.get("id"),
+            "specialist_name_assigned": specialist.get("specialist_name"),
+            "specialist_email": specialist.get("specialist_email"),
+            "hint": (
+                f"{specialist.get('specialist_name')} doesn't take live calls. "
+                f"Use schedule_callback with reason='message' to leave a note instead."
+            ),
+        })
 
-            logger.info(f"[TRANSFER] Transferring to {specialist_name} at {phone_number}")
+    phone_number = _to_e164(specialist.get("specialist_phone")) if specialist else None
+    if phone_number:
+        specialist_name = specialist.get("specialist_name", "your specialist")
 
-            return JSONResponse(content={
-                "phone_number": phone_number,
-                "specialist_name": specialist_name,
-                "success": True
-            })
+        logger.info(f"[TRANSFER] Transferring to {specialist_name} at {phone_number}")
+
+        return ORJSONResponse(content={
+            "phone_number": phone_number,
+            "specialist_name": specialist_name,
+            "success": True
+        })
+    else:
+        if specialist:
+            logger.warning(
+                f"[TRANSFER] {specialist.get('specialist_name')} matched but "
+                f"phone {specialist.get('specialist_phone')!r} is not dialable — "
+                f"routing to main office"
+            )
         else:
-            if specialist:
-                logger.warning(
-                    f"[TRANSFER] {specialist.get('specialist_name')} matched but "
-                    f"phone {specialist.get('specialist_phone')!r} is not dialable — "
-                    f"routing to main office"
-                )
-            else:
-                logger.warning(f"[TRANSFER] No specialist found for location: {caller_location}")
-            return JSONResponse(content={
-                "phone_number": MFC_MAIN_OFFICE_E164,
-                "specialist_name": "main office",
-                "success": True
-            })
-        
-    except Exception as e:
-        logger.error(f"[TRANSFER] Error: {e}", exc_info=True)
-        return JSONResponse(status_code=500, content={"error": "internal error"})
+            logger.warning(f"[TRANSFER] No specialist found for location: {caller_location}")
+        return ORJSONResponse(content={
+            "phone_number": MFC_MAIN_OFFICE_E164,
+            "specialist_name": "main office",
+            "success": True
+        })
 
 
 # ============================================================================
@@ -1,14 +1,14 @@
-import hashlib
+import asyncio
 import hmac
-import json
 import logging
 import os
 import re
 import time
 from typing import Optional, Tuple
 
+import orjson
 from fastapi import Request
-from fastapi.responses import JSONResponse
+from fastapi.responses import Response
 
 _logger = logging.getLogger(__name__)
 
@@ -22,6 +22,15 @@ _DISABLED_VALUES = {"false", "0", "no", "off"}
 _SIG_RE = re.compile(r"v=(\d+),d=(.*)")
 _FIVE_MINUTES_MS = 5 * 60 * 1000
 
+# Ceiling on how long a signed request may take to deliver its body. Retell
+# posts in well under a second; this just stops a trickling (slowloris-style)
+# client from parking a handler indefinitely.
+_BODY_READ_TIMEOUT_S = 10.0
+
+# Rejection bodies never vary, so encode them once rather than per request.
+_FORBIDDEN_BODY = orjson.dumps({"error": "forbidden"})
+_UNAUTHORIZED_BODY = orjson.dumps({"error": "invalid signature"})
+
 
 def _enforce_enabled() -> bool:
     raw = os.getenv("RETELL_SIGNATURE_ENFORCE", "true").strip().lower()
@@ -41,8 +50,40 @@ def verify_admin_token(request: Request) -> bool:
     return hmac.compare_digest(expected, provided)
 
 
-def forbidden_response() -> JSONResponse:
-    return JSONResponse(status_code=403, content={"error": "forbidden"})
+def forbidden_response() -> Response:
+    return Response(content=_FORBIDDEN_BODY, status_code=403, media_type="application/json")
+
+
+def _parse_signature(signature: str, *, now_ms: Optional[int] = None) -> Optional[Tuple[int, str]]:
+    """Split a `v={timestamp_ms},d={hex}` header into (timestamp, digest).
+
+    Returns None if the header is missing, malformed, or its timestamp is
+    outside the 5-minute replay window — none of which need the body, so
+    callers can reject before reading it.
+    """
+    if not signature:
+        return None
+    match = _SIG_RE.search(signature)
+    if not match:
+        _logger.warning("Retell signature did not match expected v=...,d=... format")
+        return None
+
+    poststamp = int(match.group(1))
+    if now_ms is None:
+        now_ms = int(time.time() * 1000)
+    if abs(now_ms - poststamp) > _FIVE_MINUTES_MS:
+        _logger.warning(
+            "Retell signature timestamp outside 5-minute window "
+            f"(drift={(now_ms - poststamp) / 1000:.1f}s)"
+        )
+        return None
+
+    post_digest = match.group(2)
+    # compare_digest raises TypeError on non-ASCII str; a hex digest never
+    # contains any, so treat it as malformed here.
+    if not post_digest.isascii():
+        return None
+    return poststamp, post_digest
 
 
 def _verify(body: bytes, signature: str, *, now_ms: Optional[int] = None) -> bool:
@@ -65,30 +106,20 @@ def _verify(body: bytes, signature: str, *, now_ms: Optional[int] = None) -> boo
             )
         return not enforce
 
-    if not signature:
+    parsed = _parse_signature(signature, now_ms=now_ms)
+    if parsed is None:
         return False
+    poststamp, post_digest = parsed
 
     try:
-        match = _SIG_RE.search(signature)
-        if not match:
-            _logger.warning("Retell signature did not match expected v=...,d=... format")
-            return False
-
-        poststamp = int(match.group(1))
-        post_digest = match.group(2)
-
-        if now_ms is None:
-            now_ms = int(time.time() * 1000)
-        if abs(now_ms - poststamp) > _FIVE_MINUTES_MS:
-            _logger.warning(
-                "Retell signature timestamp outside 5-minute window "
-                f"(drift={(now_ms - poststamp) / 1000:.1f}s)"
-            )
-            return False
-
-        body_str = body.decode("utf-8") if isinstance(body, (bytes, bytearray)) else body
-        message = (body_str + str(poststamp)).encode("utf-8")
-        expected = hmac.new(api_key.encode("utf-8"), message, hashlib.sha256).hexdigest()
+        # Retell signs the UTF-8 body text followed by the timestamp, which is
+        # byte-for-byte the raw body plus the ASCII digits — so hash the bytes
+        # we received directly rather than decoding and re-encoding them.
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        message = bytes(body) + str(poststamp).encode("ascii")
+        # One-shot C path (no HMAC object); the hex form is what Retell sends.
+        expected = hmac.digest(api_key.encode("utf-8"), message, "sha256").hex()
 
         return hmac.compare_digest(expected, post_digest)
     except Exception as e:
@@ -96,18 +127,54 @@ def _verify(body: bytes, signature: str, *, now_ms: Optional[int] = None) -> boo
         return False
 
 
+async def _read_signed_body(request: Request, key: bytes, poststamp: int) -> Tuple[bytes, str]:
+    """Stream the request body into an incremental HMAC as it arrives and
+    return (body, hex_digest). The timestamp suffix is fed last, matching
+    Retell's `body + str(timestamp_ms)` signing input."""
+    mac = hmac.new(key, digestmod="sha256")
+    chunks = []
+    async for chunk in request.stream():
+        if chunk:
+            mac.update(chunk)
+            chunks.append(chunk)
+    mac.update(str(poststamp).encode("ascii"))
+    return b"".join(chunks), mac.hexdigest()
+
+
 async def read_and_verify(request: Request) -> Tuple[bool, bytes, dict]:
-    body = await request.body()
     signature = request.headers.get("x-retell-signature", "")
-    ok = _verify(body, signature)
+    api_key = os.getenv("RETELL_API_KEY", "").strip()
+
+    if not api_key:
+        # No secret to check against — _verify owns the enforce/dev-mode
+        # decision (and its warning), so fall back to the buffered path.
+        body = await request.body()
+        ok = _verify(body, signature)
+    else:
+        # Header checks first: a missing/malformed/stale signature is
+        # rejected before a single body byte is read or hashed.
+        parsed_sig = _parse_signature(signature)
+        if parsed_sig is None:
+            return False, b"", {}
+        poststamp, post_digest = parsed_sig
+        try:
+            body, expected = await asyncio.wait_for(
+                _read_signed_body(request, api_key.encode("utf-8"), poststamp),
+                timeout=_BODY_READ_TIMEOUT_S,
+            )
+        except asyncio.TimeoutError:
+            _logger.warning(f"Retell webhook body not received within {_BODY_READ_TIMEOUT_S:.0f}s")
+            return False, b"", {}
+        ok = hmac.compare_digest(expected, post_digest)
+
     if not ok:
         return False, body, {}
     try:
-        parsed = json.loads(body) if body else {}
+        parsed = orjson.loads(body) if body else {}
     except Exception:
         return False, body, {}
     return True, body, parsed
 
 
-def unauthorized_response() -> JSONResponse:
-    return JSONResponse(status_code=401, content={"error": "invalid signature"})
+def unauthorized_response() -> Response:
+    return Response(content=_UNAUTHORIZED_BODY, status_code=401, media_type="application/json")
@@ -13,6 +13,7 @@ from .memory import (
     zep_create_thread,
     zep_add_messages,
     zep_update_user_metadata,
+    forget_zep_user,
 )
 
 from .specialists import (
@@ -59,6 +60,7 @@ __all__ = [
     "zep_create_thread",
     "zep_add_messages",
     "zep_update_user_metadata",
+    "forget_zep_user",
     # Specialists
     "MONTANA_TOWN_TO_COUNTY",
     "resolve_town_to_county",
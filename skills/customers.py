@@ -21,10 +21,9 @@ to `caller_contacts.salesrep_code`, and let us go phone -> specialist
 directly without a county-based fallback.
 """
 
-import asyncio
 from typing import Optional, Dict
 
-from config import supabase, logger
+from config import supabase, logger, run_db
 
 
 async def lookup_customer_by_phone(phone: str) -> Optional[Dict]:
@@ -55,7 +54,7 @@ async def lookup_customer_by_phone(phone: str) -> Optional[Dict]:
         return None
 
     try:
-        result = await asyncio.to_thread(
+        result = await run_db(
             lambda: supabase.table("caller_contacts")
                 .select(
                     "customer_id, customer_name, first_name, last_name, "
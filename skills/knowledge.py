@@ -4,8 +4,74 @@ Semantic search over company Q&A entries
 """
 
 import asyncio
+import time
 
-from config import supabase, logger
+from config import supabase, logger, run_db
+
+# Returned when nothing clears the similarity threshold: an explicit
+# instruction the model will read so it does NOT improvise a generic answer.
+_NO_MATCH = (
+    "NO_MATCH: The knowledge base has no entry covering this question. "
+    "Do not guess or answer from general knowledge. Tell the caller you "
+    "don't have that detail on hand and offer to have a livestock "
+    "specialist follow up."
+)
+
+# Per-answer cap for what gets read back to the voice agent. Long KB answers
+# are clipped on a word boundary so TTS never stops mid-word.
+_ANSWER_MAX_CHARS = 500
+
+
+def _clip_answer(answer: str) -> str:
+    """Trim an answer to `_ANSWER_MAX_CHARS`, backing up to the last space
+    in the final ~20% so the cut lands between words. Short answers are
+    returned untouched (no copy)."""
+    if len(answer) <= _ANSWER_MAX_CHARS:
+        return answer
+    limit = _ANSWER_MAX_CHARS - 3
+    cut = answer.rfind(" ", limit * 4 // 5, limit)
+    return answer[:cut if cut > 0 else limit] + "..."
+
+
+# Formatted results keyed by normalized query. The RPC embeds the query via
+# OpenAI on every call (the slow leg), and callers ask the same handful of
+# questions ("what are your hours", "do you deliver"), so a short TTL skips
+# the round-trip on repeats while KB edits still show up within minutes.
+# Only real answers and NO_MATCH are cached — never SEARCH_ERROR.
+_KB_CACHE_TTL_SECONDS = 5 * 60
+_KB_CACHE_MAX_ENTRIES = 256
+_kb_cache: dict[tuple[str, int], dict] = {}
+
+
+def _kb_cache_key(query: str, top_k: int) -> tuple[str, int]:
+    return " ".join(query.lower().split()), top_k
+
+
+def _kb_cache_get(key: tuple[str, int]) -> str | None:
+    entry = _kb_cache.get(key)
+    if not entry:
+        return None
+    if time.time() - entry["ts"] > _KB_CACHE_TTL_SECONDS:
+        _kb_cache.pop(key, None)
+        return None
+    return entry["data"]
+
+
+def _kb_cache_set(key: tuple[str, int], data: str) -> None:
+    now = time.time()
+    if len(_kb_cache) >= _KB_CACHE_MAX_ENTRIES:
+        for k in [k for k, v in _kb_cache.items() if now - v["ts"] > _KB_CACHE_TTL_SECONDS]:
+            _kb_cache.pop(k, None)
+        if len(_kb_cache) >= _KB_CACHE_MAX_ENTRIES:
+            _kb_cache.clear()
+    _kb_cache[key] = {"data": data, "ts": now}
+
+
+# Searches currently running, by the same key as _kb_cache. When two calls
+# ask the same question at once (or the LLM double-fires the tool), the
+# second awaits the first search instead of paying for its own RPC +
+# embedding round-trip. Entries drop out as soon as the search finishes.
+_kb_inflight: dict[tuple[str, int], asyncio.Task] = {}
 
 
 async def search_knowledge_base(query: str, top_k: int = 5) -> str:
@@ -22,8 +88,27 @@ async def search_knowledge_base(query: str, top_k: int = 5) -> str:
         return "Knowledge base unavailable."
 
     logger.info(f"[KB_SEARCH] query={query!r}")
+    cache_key = _kb_cache_key(query, top_k)
+    cached = _kb_cache_get(cache_key)
+    if cached is not None:
+        logger.info("[KB_SEARCH] cache hit")
+        return cached
+
+    task = _kb_inflight.get(cache_key)
+    if task is not None:
+        logger.info("[KB_SEARCH] joining in-flight search")
+    else:
+        task = asyncio.create_task(_search_uncached(query, top_k, cache_key))
+        _kb_inflight[cache_key] = task
+        task.add_done_callback(lambda _t: _kb_inflight.pop(cache_key, None))
+    # Shielded so one caller hanging up can't cancel the search others share.
+    return await asyncio.shield(task)
+
+
+async def _search_uncached(query: str, top_k: int, cache_key: tuple[str, int]) -> str:
+    """Run the match_knowledge_base RPC and format (and cache) the result."""
     try:
-        result = await asyncio.to_thread(
+        result = await run_db(
             lambda: supabase.rpc(
                 "match_knowledge_base",
                 # text-embedding-3-small: strong matches top out ~0.65-0.70,
@@ -41,20 +126,17 @@ async def search_knowledge_base(query: str, top_k: int = 5) -> str:
                 for item in result.data
             )
             logger.info(f"[KB_SEARCH] {len(result.data)} hits: {hits}")
-            return "\n".join([
-                f"• Q: {item['question']}\n  A: {item['answer'][:500]}"
+            formatted = "\n".join([
+                f"• Q: {item['question']}\n  A: {_clip_answer(item['answer'])}"
                 for item in result.data
             ])
+            _kb_cache_set(cache_key, formatted)
+            return formatted
 
-        # Nothing cleared the threshold. Return an explicit instruction the
-        # model will read so it does NOT improvise a generic answer.
+        # Nothing cleared the threshold.
         logger.info("[KB_SEARCH] 0 hits")
-        return (
-            "NO_MATCH: The knowledge base has no entry covering this question. "
-            "Do not guess or answer from general knowledge. Tell the caller you "
-            "don't have that detail on hand and offer to have a livestock "
-            "specialist follow up."
-        )
+        _kb_cache_set(cache_key, _NO_MATCH)
+        return _NO_MATCH
     except Exception as e:
         logger.error(f"Knowledge base search error: {e}")
         # Same contract as NO_MATCH: an explicit instruction, not prose the
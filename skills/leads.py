@@ -3,15 +3,14 @@ Montana Feed Company - Lead Management Skills
 Lead capture, lookup, and updates.
 
 All DB-touching functions are `async` and offload the synchronous Supabase
-client to a worker thread via `asyncio.to_thread`, so they don't block the
-FastAPI event loop.
+client to a worker thread via `config.run_db` (asyncio.to_thread under the
+shared Supabase concurrency cap), so they don't block the FastAPI event loop.
 """
 
-import asyncio
 from datetime import datetime, timezone
 from typing import Optional
 
-from config import supabase, logger
+from config import supabase, logger, run_db
 
 
 def _now_iso() -> str:
@@ -23,7 +22,7 @@ async def get_caller_name_from_leads(phone: str) -> Optional[str]:
     if not supabase:
         return None
     try:
-        result = await asyncio.to_thread(
+        result = await run_db(
             lambda: supabase.table("leads")
                 .select("first_name, last_name")
                 .eq("phone", phone)
@@ -57,7 +56,7 @@ async def update_lead_with_name(phone: str, first_name: str, last_name: str = ""
     if not supabase:
         return False
     try:
-        existing = await asyncio.to_thread(
+        existing = await run_db(
             lambda: supabase.table("leads")
                 .select("id, first_name")
                 .eq("phone", phone)
@@ -69,7 +68,7 @@ async def update_lead_with_name(phone: str, first_name: str, last_name: str = ""
             lead = existing.data[0]
             current_name = (lead.get("first_name") or "").lower()
             if not current_name or current_name in ["unknown", "caller"]:
-                await asyncio.to_thread(
+                await run_db(
                     lambda: supabase.table("leads")
                         .update({
                             "first_name": first_name,
@@ -82,7 +81,7 @@ async def update_lead_with_name(phone: str, first_name: str, last_name: str = ""
                 logger.info(f"Updated lead {phone} with name: {first_name} {last_name}")
                 return True
         else:
-            await asyncio.to_thread(
+            await run_db(
                 lambda: supabase.table("leads").insert({
                     "first_name": first_name,
                     "last_name": last_name,
@@ -111,7 +110,7 @@ async def capture_lead(name: str, phone: str, location: str, interests: str) ->
         first_name = name_parts[0] if name_parts else "Unknown"
         last_name = name_parts[1] if len(name_parts) > 1 else ""
 
-        result = await asyncio.to_thread(
+        result = await run_db(
             lambda: supabase.table("leads").insert({
                 "first_name": first_name,
                 "last_name": last_name,
@@ -169,7 +168,7 @@ async def create_message_for_specialist(
             "created_at": _now_iso(),
             "updated_at": _now_iso(),
         }
-        result = await asyncio.to_thread(
+        result = await run_db(
             lambda: supabase.table("callbacks").insert(payload).execute()
         )
         if result.data and len(result.data) > 0:
@@ -7,17 +7,22 @@ Version 3.0.1 - Added automatic specialist lookup
 import asyncio
 import re
 import logging
+import time
+from itertools import islice, takewhile
 from typing import Optional, Dict, List, Any
 
+import orjson
+
 from config import (
     ZEP_API_KEY,
     ZEP_BASE_URL,
-    ZEP_HEADERS,
     get_zep_client,
-    normalize_phone,
+    caller_user_id,
+    response_json,
     logger,
 )
 from .leads import update_lead_with_name
+from .specialists import lookup_specialist_by_town
 
 # Hold references to fire-and-forget tasks so asyncio doesn't GC them
 # before they finish. Tasks remove themselves via the done_callback.
@@ -38,34 +43,121 @@ def _fire_and_forget(coro, label: str = "task") -> None:
 
     task.add_done_callback(_on_done)
 
+
+# Recently-read Zep user documents, keyed by user_id. The call_inbound
+# lookup fills it, and the same call's call_ended save then uses it to
+# write only what changed (see zep_create_or_update_user); a redial or a
+# call_ended that missed the per-call cache skips the Zep GET. The TTL
+# covers a typical call and no more, because Zep can also be edited from
+# its dashboard. Writes made through this module keep the entry current
+# (name/metadata changes are applied to the cached copy; failed writes drop
+# it), and main.py's admin endpoints call forget_zep_user after patching
+# Zep directly. Misses aren't cached.
+_ZEP_USER_CACHE_TTL_SECONDS = 15 * 60
+_ZEP_USER_CACHE_MAX_ENTRIES = 512
+_zep_user_cache: dict[str, dict] = {}
+
+
+def _zep_user_cache_get(user_id: str) -> Optional[Dict]:
+    entry = _zep_user_cache.get(user_id)
+    if not entry:
+        return None
+    if time.time() - entry["ts"] > _ZEP_USER_CACHE_TTL_SECONDS:
+        _zep_user_cache.pop(user_id, None)
+        return None
+    return entry["data"]
+
+
+def _zep_user_cache_set(user_id: str, data: Dict) -> None:
+    now = time.time()
+    if len(_zep_user_cache) >= _ZEP_USER_CACHE_MAX_ENTRIES:
+        for k in [k for k, v in _zep_user_cache.items() if now - v["ts"] > _ZEP_USER_CACHE_TTL_SECONDS]:
+            _zep_user_cache.pop(k, None)
+        if len(_zep_user_cache) >= _ZEP_USER_CACHE_MAX_ENTRIES:
+            _zep_user_cache.clear()
+    _zep_user_cache[user_id] = {"data": data, "ts": now}
+
+
+def forget_zep_user(user_id: str) -> None:
+    """Drop a cached Zep user so the next zep_get_user re-reads it. Call
+    after writing to the user without going through this module."""
+    _zep_user_cache.pop(user_id, None)
+
 # ============================================================================
 # ZEP CLOUD HTTP API FUNCTIONS (USING PERSISTENT CLIENT)
 # ============================================================================
 
 async def zep_get_user(user_id: str) -> Optional[Dict]:
-    """Get a Zep user's details."""
+    """Get a Zep user's details. Served from `_zep_user_cache` when the
+    same user was read recently — treat the result as read-only."""
     _zep_client = get_zep_client()
     if not ZEP_API_KEY or not _zep_client:
         return None
+    cached = _zep_user_cache_get(user_id)
+    if cached is not None:
+        return cached
     try:
         response = await _zep_client.get(
-            f"{ZEP_BASE_URL}/users/{user_id}",
-            headers=ZEP_HEADERS
+            f"{ZEP_BASE_URL}/users/{user_id}"
         )
         if response.status_code == 200:
-            return response.json()
+            user = response_json(response)
+            _zep_user_cache_set(user_id, user)
+            return user
         return None
     except Exception as e:
         logger.error(f"Error getting Zep user: {e}")
         return None
 
 
+async def _zep_update_known_user(user_id: str, cached: Dict, first_name: str, metadata: Optional[Dict]) -> Optional[Dict]:
+    """PATCH only the fields of a cached Zep user that differ from what we're
+    saving. Returns the up-to-date user, or None if a PATCH failed (e.g. the
+    user was deleted from the dashboard) so the caller can fall back to the
+    POST path."""
+    _zep_client = get_zep_client()
+    name_changed = cached.get("first_name") != first_name
+    if name_changed:
+        response = await _zep_client.patch(
+            f"{ZEP_BASE_URL}/users/{user_id}",
+            content=orjson.dumps({"first_name": first_name}),
+        )
+        if response.status_code != 200:
+            forget_zep_user(user_id)
+            return None
+        cached = {**cached, "first_name": first_name}
+        _zep_user_cache_set(user_id, cached)
+
+    current = cached.get("metadata") or {}
+    changed = {k: v for k, v in (metadata or {}).items() if current.get(k) != v}
+    if changed and not await zep_update_user_metadata(user_id, changed):
+        return None
+
+    if name_changed or changed:
+        logger.info(f"Updated Zep user {user_id} (name={name_changed}, metadata={sorted(changed)})")
+    else:
+        logger.info(f"Zep user {user_id} unchanged — skipped write")
+    return _zep_user_cache_get(user_id) or cached
+
+
 async def zep_create_or_update_user(user_id: str, phone: str, first_name: str = "Caller", metadata: Dict = None) -> Optional[Dict]:
-    """Create or update a Zep user with metadata."""
+    """Create or update a Zep user with metadata.
+
+    A user still in `_zep_user_cache` (normally read by this call's
+    lookup_caller_fast) is known to exist, so only the differing fields are
+    PATCHed — no POST → 400 "already exists" → PATCH round-trips, and no
+    request at all when nothing changed. Otherwise POST, and PATCH on 400.
+    """
     _zep_client = get_zep_client()
     if not ZEP_API_KEY or not _zep_client:
         return None
     try:
+        cached = _zep_user_cache_get(user_id)
+        if cached is not None:
+            updated = await _zep_update_known_user(user_id, cached, first_name, metadata)
+            if updated is not None:
+                return updated
+
         user_data = {
             "user_id": user_id,
             "first_name": first_name,
@@ -74,30 +166,28 @@ async def zep_create_or_update_user(user_id: str, phone: str, first_name: str =
 
         response = await _zep_client.post(
             f"{ZEP_BASE_URL}/users",
-            headers=ZEP_HEADERS,
-            json=user_data
+            content=orjson.dumps(user_data)
         )
+        forget_zep_user(user_id)
 
         if response.status_code in [200, 201]:
             logger.info(f"Created Zep user: {user_id} with name: {first_name}")
-            return response.json()
+            return response_json(response)
         elif response.status_code == 400 and "already exists" in response.text:
             # Update name only — metadata goes through zep_update_user_metadata
-            # below, which pre-merges with the existing metadata. Empirical
-            # (2026-05-13): Zep's PATCH MERGES metadata keys (it does not
-            # replace wholesale), and a `null` value is a no-op rather than a
-            # delete — so pre-merging locally keeps the behavior explicit and
-            # lets callers "clear" fields by sending "".
+            # below. Empirical (2026-05-13): Zep's PATCH MERGES metadata keys
+            # (it does not replace wholesale), and a `null` value is a no-op
+            # rather than a delete — callers "clear" fields by sending "".
             response = await _zep_client.patch(
                 f"{ZEP_BASE_URL}/users/{user_id}",
-                headers=ZEP_HEADERS,
-                json={"first_name": first_name},
+                content=orjson.dumps({"first_name": first_name}),
             )
+            forget_zep_user(user_id)
             if metadata:
                 await zep_update_user_metadata(user_id, metadata)
             if response.status_code == 200:
                 logger.info(f"Updated Zep user {user_id}")
-                return response.json()
+                return response_json(response)
             return {"user_id": user_id, "exists": True}
         return None
     except Exception as e:
@@ -113,11 +203,10 @@ async def zep_create_thread(thread_id: str, user_id: str) -> Optional[Dict]:
     try:
         response = await _zep_client.post(
             f"{ZEP_BASE_URL}/threads",
-            headers=ZEP_HEADERS,
-            json={"thread_id": thread_id, "user_id": user_id}
+            content=orjson.dumps({"thread_id": thread_id, "user_id": user_id})
         )
         if response.status_code in [200, 201]:
-            return response.json()
+            return response_json(response)
         return None
     except Exception as e:
         logger.error(f"Error creating Zep thread: {e}")
@@ -132,11 +221,10 @@ async def zep_add_messages(thread_id: str, messages: List[Dict]) -> Optional[Dic
     try:
         response = await _zep_client.post(
             f"{ZEP_BASE_URL}/threads/{thread_id}/messages",
-            headers=ZEP_HEADERS,
-            json={"messages": messages}
+            content=orjson.dumps({"messages": messages})
         )
         if response.status_code in [200, 201]:
-            return response.json()
+            return response_json(response)
         logger.warning(f"Zep add messages returned {response.status_code}: {response.text}")
         return None
     except Exception as e:
@@ -145,35 +233,36 @@ async def zep_add_messages(thread_id: str, messages: List[Dict]) -> Optional[Dic
 
 
 async def zep_update_user_metadata(user_id: str, new_metadata: Dict) -> bool:
-    """Update user metadata safely by merging with existing."""
+    """Set the given metadata keys on a Zep user, leaving other keys alone.
+
+    One PATCH, no GET: Zep's PATCH merges `metadata` key-by-key server-side
+    (verified 2026-05-13), so sending only the changed keys is enough. Note
+    a `null` value is a no-op there, not a delete — clear a key with "".
+    Returns False if the user doesn't exist (404) or the PATCH fails.
+    """
     _zep_client = get_zep_client()
     if not ZEP_API_KEY or not _zep_client:
         return False
     try:
-        # Get current user data
-        get_resp = await _zep_client.get(
+        patch_resp = await _zep_client.patch(
             f"{ZEP_BASE_URL}/users/{user_id}",
-            headers=ZEP_HEADERS
+            content=orjson.dumps({"metadata": new_metadata})
         )
-        
-        if get_resp.status_code == 200:
-            user_data = get_resp.json()
-            metadata = user_data.get("metadata", {}) or {}
-            
-            # Merge in new metadata
-            metadata.update(new_metadata)
-            
-            # Update user
-            patch_resp = await _zep_client.patch(
-                f"{ZEP_BASE_URL}/users/{user_id}",
-                headers=ZEP_HEADERS,
-                json={"metadata": metadata}
-            )
-            
-            if patch_resp.status_code == 200:
-                logger.info(f"Updated Zep metadata for {user_id}: {new_metadata}")
-                return True
-        
+
+        if patch_resp.status_code == 200:
+            logger.info(f"Updated Zep metadata for {user_id}: {new_metadata}")
+            # Apply the same merge to the cached copy (None is a no-op on
+            # Zep's side too) instead of dropping it, so a lookup right after
+            # a save still skips the GET. A fresh dict, never an in-place
+            # edit — callers may be holding the old one.
+            cached = _zep_user_cache_get(user_id)
+            if cached is not None:
+                merged = dict(cached.get("metadata") or {})
+                merged.update((k, v) for k, v in new_metadata.items() if v is not None)
+                _zep_user_cache_set(user_id, {**cached, "metadata": merged})
+            return True
+
+        forget_zep_user(user_id)
         return False
     except Exception as e:
         logger.error(f"Error updating Zep metadata: {e}")
@@ -184,63 +273,89 @@ async def zep_update_user_metadata(user_id: str, new_metadata: Dict) -> bool:
 # NAME EXTRACTION
 # ============================================================================
 
-def extract_name_from_transcript(transcript: List[Dict]) -> Optional[str]:
-    """Extract caller's name from conversation transcript."""
-    if not transcript:
-        return None
-
-    skip_words = {
-        "good", "fine", "great", "well", "okay", "ok", "alright",
-        "here", "calling", "looking", "interested", "wondering",
-        "thinking", "trying", "wanting", "needing", "hoping",
-        "just", "actually", "really", "very", "pretty",
-        "hello", "hi", "hey", "morning", "afternoon", "evening",
-        "what", "who", "where", "when", "why", "how",
-        "glad", "happy", "pleased", "sure", "ready",
-        "new", "old", "young", "local", "nearby",
-        "customer", "caller", "rancher", "farmer", "producer",
-    }
-
-    # Connectors that the case-insensitive regex can capture as a bogus second
-    # word (e.g. "my name is MacGregor and"). Trim these from the tail before
-    # returning.
-    trailing_connectors = {
-        "and", "from", "over", "out", "here", "calling", "up", "in", "at",
-        "with", "of", "on", "for", "to", "the", "a", "an",
-    }
-
-    name_patterns = [
-        r"my name is\s+([A-Z][a-z]+(?:\s+[A-Z][a-z]+)?)",
-        r"this is\s+([A-Z][a-z]+(?:\s+[A-Z][a-z]+)?)\s+calling",
-        r"(?:^|\.\s+)I'?m\s+([A-Z][a-z]+(?:\s+[A-Z][a-z]+)?)(?:\s*[,.]|\s+and\s|\s+from\s|\s+over\s|\s+out\s|\s+here\s|$)",
-        r"call me\s+([A-Z][a-z]+)",
-        r"the name is\s+([A-Z][a-z]+(?:\s+[A-Z][a-z]+)?)",
-    ]
-
-    user_messages = [
-        msg.get("content", "")
-        for msg in transcript[:8]
+# First words that mean the name regexes caught filler speech ("I'm good",
+# "this is just calling"), not a name.
+_NAME_SKIP_WORDS = frozenset({
+    "good", "fine", "great", "well", "okay", "ok", "alright",
+    "here", "calling", "looking", "interested", "wondering",
+    "thinking", "trying", "wanting", "needing", "hoping",
+    "just", "actually", "really", "very", "pretty",
+    "hello", "hi", "hey", "morning", "afternoon", "evening",
+    "what", "who", "where", "when", "why", "how",
+    "glad", "happy", "pleased", "sure", "ready",
+    "new", "old", "young", "local", "nearby",
+    "customer", "caller", "rancher", "farmer", "producer",
+})
+
+# Compiled once at import; IGNORECASE because ASR often emits all-lowercase.
+_NAME_PATTERNS = tuple(re.compile(p, re.IGNORECASE) for p in (
+    r"my name is\s+([A-Z][a-z]+(?:\s+[A-Z][a-z]+)?)",
+    r"this is\s+([A-Z][a-z]+(?:\s+[A-Z][a-z]+)?)\s+calling",
+    r"(?:^|\.\s+)I'?m\s+([A-Z][a-z]+(?:\s+[A-Z][a-z]+)?)(?:\s*[,.]|\s+and\s|\s+from\s|\s+over\s|\s+out\s|\s+here\s|$)",
+    r"call me\s+([A-Z][a-z]+)",
+    r"the name is\s+([A-Z][a-z]+(?:\s+[A-Z][a-z]+)?)",
+))
+
+# Every pattern above needs one of these phrases, so a message without any of
+# them ("yeah I need a quote on mineral tubs") is dismissed with one scan
+# instead of five IGNORECASE searches. Keep in sync when adding a pattern.
+_NAME_TRIGGER = re.compile(r"my name is|this is|i'?m\s|call me|the name is", re.IGNORECASE)
+
+
+# Connectors that the case-insensitive regex can capture as a bogus second
+# word (e.g. "my name is MacGregor and"). Trimmed from the tail of a capture.
+_NAME_TRAILING_CONNECTORS = frozenset({
+    "and", "from", "over", "out", "here", "calling", "up", "in", "at",
+    "with", "of", "on", "for", "to", "the", "a", "an",
+})
+
+# A capture needs at least one letter to be a name. `[^\W\d_]` is "any
+# Unicode letter" — the same test as str.isalpha, in one C-level scan.
+_HAS_ALPHA = re.compile(r"[^\W\d_]")
+
+# How far into the call each extractor looks, in transcript turns (agent
+# turns included). Names come early; a town can come up a little later.
+_NAME_SCAN_TURNS = 8
+_LOCATION_SCAN_TURNS = 15
+
+
+def _early_user_turns(transcript: List[Dict]) -> List[tuple]:
+    """(turn index, text) for each non-empty user turn within the first
+    _LOCATION_SCAN_TURNS entries. Built once per save and shared by both
+    extractors; the index lets the name pass keep its tighter window."""
+    return [
+        (i, msg["content"])
+        for i, msg in enumerate(islice(transcript, _LOCATION_SCAN_TURNS))
         if msg.get("role") == "user" and msg.get("content")
     ]
 
+
+def extract_name_from_transcript(user_messages: List[str]) -> Optional[str]:
+    """Extract caller's name from the caller's early messages (user turns
+    only, in order — see _early_user_turns)."""
+    if not user_messages:
+        return None
+
     for message in user_messages:
-        for pattern in name_patterns:
-            match = re.search(pattern, message, re.IGNORECASE)
+        if not _NAME_TRIGGER.search(message):
+            continue
+        for pattern in _NAME_PATTERNS:
+            match = pattern.search(message)
             if match:
                 name = match.group(1).strip()
                 first_word = name.split()[0].lower() if name else ""
 
-                if first_word in skip_words:
+                if first_word in _NAME_SKIP_WORDS:
                     continue
                 if len(name) < 2 or len(name) > 40:
                     continue
-                if not any(c.isalpha() for c in name):
+                if not _HAS_ALPHA.search(name):
                     continue
 
                 # Trim any trailing connector ("MacGregor and" -> "MacGregor")
                 # that the case-insensitive regex may have pulled in.
                 parts = name.split()
-                while len(parts) > 1 and parts[-1].lower() in trailing_connectors:
+                while len(parts) > 1 and parts[-1].lower() in _NAME_TRAILING_CONNECTORS:
                     parts.pop()
                 name = " ".join(parts)
 
@@ -261,55 +376,62 @@ def extract_name_from_transcript(transcript: List[Dict]) -> Optional[str]:
 # speech ("I'm in the truck", "calling from my house"). A capture made up
 # entirely of these is ASR junk, not a town — a literal "In The" got saved
 # as a caller's location and read back to him on 2026-08-04.
-_LOCATION_STOPWORDS = {
+_LOCATION_STOPWORDS = frozenset({
     "the", "a", "an", "that", "there", "here", "this", "my", "our", "your",
     "his", "her", "their", "town", "state", "county", "area", "middle",
     "montana", "wyoming", "truck", "tractor", "pickup", "house", "barn",
     "field", "pasture", "road", "way", "morning", "afternoon", "evening",
-}
+})
+
+
+# Towns we recognize anywhere in a caller's message.
+# Keep this aligned with MONTANA_TOWN_TO_COUNTY in skills/specialists.py —
+# any town here should also have a county mapping there so the specialist
+# lookup resolves.
+_KNOWN_LOCATIONS = (
+    # Montana
+    "polson", "missoula", "billings", "bozeman", "kalispell", "helena",
+    "great falls", "butte", "havre", "miles city", "livingston", "whitefish",
+    "columbia falls", "bigfork", "ronan", "st ignatius", "charlo",
+    "dillon", "lewistown", "columbus", "glasgow", "glendive",
+    # Wyoming — Riverton store service area
+    "riverton", "lander", "dubois", "thermopolis", "worland",
+    "shoshoni", "hudson", "pavillion",
+)
 
+# All of the above as one alternation, so each message is a single C-level
+# scan instead of a Python `in` test per town. Longest names first so a
+# multi-word town can't be shadowed by a shorter alternative; \b keeps
+# "butte" from firing inside "buttes" or "havre" inside a longer word.
+# Case-sensitive on purpose: it runs on the already-lowercased message.
+_KNOWN_LOCATION_RE = re.compile(
+    r"\b(" + "|".join(map(re.escape, sorted(_KNOWN_LOCATIONS, key=len, reverse=True))) + r")\b"
+)
+_KNOWN_LOCATION_TITLES = {loc: loc.title() for loc in _KNOWN_LOCATIONS}
 
-def extract_location_from_transcript(transcript: List[Dict]) -> Optional[str]:
-    """Extract location from conversation transcript."""
-    if not transcript:
-        return None
+# Loose "from X" / "live in X" fallbacks, compiled once at import.
+_LOCATION_PATTERNS = tuple(re.compile(p, re.IGNORECASE) for p in (
+    r"(?:from|in|near|around|out of)\s+([A-Z][a-z]+(?:\s+[A-Z][a-z]+)?)",
+    r"(?:live in|located in|based in)\s+([A-Z][a-z]+)",
+    r"(?:I'm|we're)\s+(?:in|at|from)\s+([A-Z][a-z]+)",
+))
 
-    # Towns we recognize by exact substring match in lowercased transcripts.
-    # Keep this aligned with MONTANA_TOWN_TO_COUNTY in skills/specialists.py —
-    # any town here should also have a county mapping there so the specialist
-    # lookup resolves.
-    known_locations = [
-        # Montana
-        "polson", "missoula", "billings", "bozeman", "kalispell", "helena",
-        "great falls", "butte", "havre", "miles city", "livingston", "whitefish",
-        "columbia falls", "bigfork", "ronan", "st ignatius", "charlo",
-        "dillon", "lewistown", "columbus", "glasgow", "glendive",
-        # Wyoming — Riverton store service area
-        "riverton", "lander", "dubois", "thermopolis", "worland",
-        "shoshoni", "hudson", "pavillion",
-    ]
 
-    location_patterns = [
-        r"(?:from|in|near|around|out of)\s+([A-Z][a-z]+(?:\s+[A-Z][a-z]+)?)",
-        r"(?:live in|located in|based in)\s+([A-Z][a-z]+)",
-        r"(?:I'm|we're)\s+(?:in|at|from)\s+([A-Z][a-z]+)",
-    ]
-
-    user_messages = [
-        msg.get("content", "")
-        for msg in transcript[:15]
-        if msg.get("role") == "user" and msg.get("content")
-    ]
+def extract_location_from_transcript(user_messages: List[str]) -> Optional[str]:
+    """Extract location from the caller's early messages (user turns only,
+    in order — see _early_user_turns)."""
+    if not user_messages:
+        return None
 
     for message in user_messages:
-        message_lower = message.lower()
-        for location in known_locations:
-            if location in message_lower:
-                logger.info(f"Found known location in transcript: {location.title()}")
-                return location.title()
-
-        for pattern in location_patterns:
-            match = re.search(pattern, message, re.IGNORECASE)
+        known = _KNOWN_LOCATION_RE.search(message.lower())
+        if known:
+            location = _KNOWN_LOCATION_TITLES[known.group(1)]
+            logger.info(f"Found known location in transcript: {location}")
+            return location
+
+        for pattern in _LOCATION_PATTERNS:
+            match = pattern.search(message)
             if match:
                 potential_location = match.group(1).strip()
                 words = potential_location.lower().split()
@@ -326,64 +448,90 @@ def extract_location_from_transcript(transcript: List[Dict]) -> Optional[str]:
 # MEMORY LOOKUP - WITH FULL CONTEXT RETRIEVAL AND AUTO-SPECIALIST LOOKUP
 # ============================================================================
 
+# Zep metadata surfaced to the agent as conversation context, in display
+# order: (label, metadata keys to try — first non-empty wins). Location has
+# aliases because older saves wrote "city" / "town".
+_META_FIELDS = (
+    ("Location", ("location", "city", "town")),
+    ("Specialist", ("specialist",)),
+    ("Preferences", ("preferences",)),
+    ("Last discussed", ("last_topic",)),
+)
+
+
+# lookup_caller_fast's answer for a caller with nothing on file (and, with
+# its message swapped, for a failed lookup). Callers get a fresh copy with
+# `user_id` added — never hand this dict out directly.
+_NEW_CALLER_RESULT = {
+    "found": False,
+    "caller_name": None,
+    "caller_location": None,
+    "caller_specialist": None,
+    "conversation_history": "",
+    "message": "New caller",
+}
+
+
 async def lookup_caller_fast(phone: str) -> Dict[str, Any]:
     """Fast caller lookup with memory context retrieval and automatic specialist assignment."""
+    user_id = caller_user_id(phone)
     try:
-        user_id = f"caller_{normalize_phone(phone)}"
-
         zep_user = await zep_get_user(user_id)
+        if not zep_user:
+            # No Zep record at all — the most common inbound case.
+            logger.info("[MEMORY] New caller - no previous data")
+            return {**_NEW_CALLER_RESULT, "user_id": user_id}
 
         caller_name = None
         caller_location = None
         caller_specialist = None
         conversation_context = ""
 
-        if zep_user:
-            zep_name = zep_user.get("first_name", "")
-            if zep_name and zep_name.lower() not in ["caller", "unknown", "wondering", ""]:
-                if not any(word in zep_name.lower() for word in ["wondering", "looking", "thinking", "calling"]):
-                    caller_name = zep_name
-                    logger.info(f"[MEMORY] Name: {caller_name}")
-
-            metadata = zep_user.get("metadata", {})
-            if metadata and isinstance(metadata, dict):
-                caller_location = metadata.get("location") or metadata.get("city") or metadata.get("town")
-                caller_specialist = metadata.get("specialist")
-
-                # AUTO-LOOKUP: If we have location but no specialist, look it up now.
-                # The Supabase lookup stays on the hot path because we need the
-                # specialist name for THIS call's dynamic vars. The Zep PATCH
-                # (which just saves the result for next time) is fire-and-forget
-                # so Retell gets its `call_inbound` response ~80ms sooner.
-                if caller_location and not caller_specialist:
-                    from .specialists import lookup_specialist_by_town
-                    specialist_info = await lookup_specialist_by_town(caller_location)
-                    if specialist_info:
-                        caller_specialist = specialist_info["specialist_name"]
-                        _fire_and_forget(
-                            zep_update_user_metadata(user_id, {"specialist": caller_specialist}),
-                            label=f"save_specialist({user_id})",
-                        )
-                        logger.info(f"[MEMORY] Auto-assigned specialist: {caller_specialist}")
-
-                if caller_location:
-                    logger.info(f"[MEMORY] Location: {caller_location}")
-                if caller_specialist:
-                    logger.info(f"[MEMORY] Specialist: {caller_specialist}")
-
-                context_parts = []
-                if caller_location:
-                    context_parts.append(f"Location: {caller_location}")
-                if caller_specialist:
-                    context_parts.append(f"Specialist: {caller_specialist}")
-                if metadata.get("preferences"):
-                    context_parts.append(f"Preferences: {metadata['preferences']}")
-                if metadata.get("last_topic"):
-                    context_parts.append(f"Last discussed: {metadata['last_topic']}")
-
-                if context_parts:
-                    conversation_context = " | ".join(context_parts)
-                    logger.info(f"[MEMORY] Context: {conversation_context}")
+        zep_name = zep_user.get("first_name", "")
+        if zep_name and zep_name.lower() not in ["caller", "unknown", "wondering", ""]:
+            if not any(word in zep_name.lower() for word in ["wondering", "looking", "thinking", "calling"]):
+                caller_name = zep_name
+                logger.info(f"[MEMORY] Name: {caller_name}")
+
+        metadata = zep_user.get("metadata", {})
+        if metadata and isinstance(metadata, dict):
+            # One walk over _META_FIELDS: label -> first non-empty value.
+            fields = {}
+            for label, keys in _META_FIELDS:
+                for k in keys:
+                    v = metadata.get(k)
+                    if v:
+                        fields[label] = v
+                        break
+            caller_location = fields.get("Location")
+            caller_specialist = fields.get("Specialist")
+
+            # AUTO-LOOKUP: If we have location but no specialist, look it up now.
+            # The Supabase lookup stays on the hot path because we need the
+            # specialist name for THIS call's dynamic vars. The Zep PATCH
+            # (which just saves the result for next time) is fire-and-forget
+            # so Retell gets its `call_inbound` response ~80ms sooner.
+            if caller_location and not caller_specialist:
+                specialist_info = await lookup_specialist_by_town(caller_location)
+                if specialist_info:
+                    caller_specialist = specialist_info["specialist_name"]
+                    fields["Specialist"] = caller_specialist
+                    _fire_and_forget(
+                        zep_update_user_metadata(user_id, {"specialist": caller_specialist}),
+                        label=f"save_specialist({user_id})",
+                    )
+                    logger.info(f"[MEMORY] Auto-assigned specialist: {caller_specialist}")
+
+            if caller_location:
+                logger.info(f"[MEMORY] Location: {caller_location}")
+            if caller_specialist:
+                logger.info(f"[MEMORY] Specialist: {caller_specialist}")
+
+            if fields:
+                conversation_context = " | ".join(
+                    f"{label}: {fields[label]}" for label, _ in _META_FIELDS if label in fields
+                )
+                logger.info(f"[MEMORY] Context: {conversation_context}")
 
         if not caller_name:
             logger.info("[MEMORY] New caller - no previous data")
@@ -399,16 +547,17 @@ async def lookup_caller_fast(phone: str) -> Dict[str, Any]:
         }
 
     except Exception as e:
-        logger.error(f"Error in lookup_caller_fast: {e}", exc_info=True)
-        return {
-            "found": False,
-            "user_id": f"caller_{normalize_phone(phone)}",
-            "caller_name": None,
-            "caller_location": None,
-            "caller_specialist": None,
-            "conversation_history": "",
-            "message": f"Error: {str(e)}"
-        }
+        logger.exception("Error in lookup_caller_fast: %s", e)
+        return {**_NEW_CALLER_RESULT, "user_id": user_id, "message": f"Error: {str(e)}"}
+
+
+# Zep caps a single add-messages request at 30 messages, so long calls are
+# split into batches. The batches go out one after another, not gathered:
+# each POST appends to the same thread, and concurrent appends can land out
+# of order and scramble the stored conversation. A typical call is 1-2
+# batches, and the save runs from the call_ended webhook after the caller
+# has hung up, so the extra round-trip is never heard on the line.
+_ZEP_MAX_BATCH = 30
 
 
 async def save_call_to_zep(phone: str, transcript: List[Dict], call_id: str, caller_name: str = None) -> Dict[str, Any]:
@@ -417,58 +566,71 @@ async def save_call_to_zep(phone: str, transcript: List[Dict], call_id: str, cal
         return {"success": False, "message": "Zep not configured"}
 
     try:
-        user_id = f"caller_{normalize_phone(phone)}"
+        user_id = caller_user_id(phone)
+
+        user_turns = _early_user_turns(transcript)
 
         extracted_name = None
         if not caller_name or caller_name.lower() in ["caller", "unknown", "new caller"]:
-            extracted_name = extract_name_from_transcript(transcript)
+            extracted_name = extract_name_from_transcript(
+                # user_turns is in turn order, so stop at the first turn
+                # past the name window instead of testing every entry.
+                [text for _, text in takewhile(lambda t: t[0] < _NAME_SCAN_TURNS, user_turns)]
+            )
             if extracted_name:
                 logger.info(f"Extracted name: {extracted_name}")
                 caller_name = extracted_name
 
-        extracted_location = extract_location_from_transcript(transcript)
+        extracted_location = extract_location_from_transcript([text for _, text in user_turns])
 
         metadata = {"phone": phone}
         if extracted_location:
             metadata["location"] = extracted_location
             logger.info(f"Extracted location: {extracted_location}")
 
+        # The Zep user upsert and the Supabase lead update are independent
+        # (different services, neither reads the other), so they run
+        # concurrently. The thread create has to wait for the user: Zep
+        # rejects a thread whose user_id doesn't exist yet, which is exactly
+        # the first-time-caller case. Both helpers log and swallow their
+        # own errors, so gather never raises here.
         if caller_name and caller_name.lower() not in ["caller", "unknown", "new caller"]:
-            await zep_create_or_update_user(user_id, phone, first_name=caller_name, metadata=metadata)
-
             name_parts = caller_name.split(None, 1)
             first_name = name_parts[0]
             last_name = name_parts[1] if len(name_parts) > 1 else ""
-            await update_lead_with_name(phone, first_name, last_name)
+            await asyncio.gather(
+                zep_create_or_update_user(user_id, phone, first_name=caller_name, metadata=metadata),
+                update_lead_with_name(phone, first_name, last_name),
+            )
         else:
             await zep_create_or_update_user(user_id, phone, first_name="Caller", metadata=metadata)
 
         thread_id = f"call_{call_id}"
         await zep_create_thread(thread_id, user_id)
 
+        # Single pass; the caller's display name and the per-call metadata
+        # are built once rather than per utterance.
+        user_name = caller_name or "Caller"
+        message_metadata = {"call_id": call_id, "phone": phone}
         zep_messages = []
         for entry in transcript:
-            role = entry.get("role", "user")
-            content = entry.get("content", "")
+            content = entry.get("content")
             if not content:
                 continue
-
-            zep_role = "user" if role == "user" else "assistant"
-            message_name = caller_name if role == "user" and caller_name else ("Caller" if role == "user" else "MFC Agent")
-
+            is_user = entry.get("role", "user") == "user"
             zep_messages.append({
-                "role": zep_role,
+                "role": "user" if is_user else "assistant",
                 "content": content,
-                "name": message_name,
-                "metadata": {"call_id": call_id, "phone": phone}
+                "name": user_name if is_user else "MFC Agent",
+                "metadata": message_metadata,
             })
 
         if zep_messages:
-            batch_size = 30
+            # Sequential on purpose — see _ZEP_MAX_BATCH.
             total_saved = 0
-            for i in range(0, len(zep_messages), batch_size):
-                batch = zep_messages[i:i + batch_size]
-                logger.info(f"Saving batch {i//batch_size + 1}: {len(batch)} messages")
+            for i in range(0, len(zep_messages), _ZEP_MAX_BATCH):
+                batch = zep_messages[i:i + _ZEP_MAX_BATCH]
+                logger.debug("Saving batch %d: %d messages", i // _ZEP_MAX_BATCH + 1, len(batch))
                 result = await zep_add_messages(thread_id, batch)
                 if result:
                     total_saved += len(batch)
@@ -486,5 +648,5 @@ async def save_call_to_zep(phone: str, transcript: List[Dict], call_id: str, cal
         return {"success": False, "message": "No messages saved"}
 
     except Exception as e:
-        logger.error(f"Error saving to Zep: {e}", exc_info=True)
+        logger.exception("Error saving to Zep: %s", e)
         return {"success": False, "message": str(e)}
@@ -4,16 +4,20 @@ Montana Feed Company - Specialist Lookup Skills
 
 DB-touching functions (lookup_staff_by_name, lookup_specialist_by_town) are
 `async` and offload the synchronous Supabase client to a worker thread via
-`asyncio.to_thread`, so they don't block the FastAPI event loop. Pure helpers
-(`is_lps`, `resolve_town_to_county`) stay synchronous.
+`config.run_db`, so they don't block the FastAPI event loop. The staff and
+town lookups read one short-TTL snapshot of the active roster
+(`_active_specialists`). Pure helpers (`is_lps`, `resolve_town_to_county`)
+stay synchronous.
 """
 
 import asyncio
 import logging
 import re
-from typing import Optional, Dict
+import time
+from types import MappingProxyType
+from typing import Mapping, Optional, Dict
 
-from config import supabase, logger
+from config import supabase, logger, run_db
 
 # Whitelist of characters allowed in a staff-name search. Everything else is
 # stripped before the value is interpolated into a PostgREST `or_()` filter —
@@ -44,7 +48,7 @@ def _sanitize_name(value: str) -> str:
 #     not live transfer
 # The section headers below describe geography, not current ownership.
 
-MONTANA_TOWN_TO_COUNTY = {
+MONTANA_TOWN_TO_COUNTY: Mapping[str, str] = MappingProxyType({
     # SOUTHWEST MONTANA — Taylor Staudenmeyer
     "dillon": "Beaverhead County",
     "lima": "Beaverhead County",
@@ -228,7 +232,26 @@ MONTANA_TOWN_TO_COUNTY = {
     "msla": "Missoula County",
     "gt falls": "Cascade County",
     "gf": "Cascade County",
-}
+})
+
+# Town names arrive from ASR / LLM args with stray casing and punctuation
+# ("Deer-Lodge", "Lewistown.", "virginia  city"). One regex pass folds every
+# run of non-alphanumerics into a single space, which is exactly the shape
+# of the keys above (lowercase words, single spaces) — so a lookup is one
+# re.sub + one dict probe, and punctuated input still hits.
+_TOWN_KEY_JUNK = re.compile(r"[^a-z0-9]+")
+
+
+# Input that already names a county ("Fergus County", "fergus county mt")
+# passes through unchanged. Matched as a whole word on the normalized key so
+# a town that merely contains the letters ("Countyline") still gets
+# " County" appended.
+_ALREADY_COUNTY = re.compile(r"\bcounty\b")
+
+
+def _town_key(name: str) -> str:
+    """Normalize a town name to MONTANA_TOWN_TO_COUNTY's key form."""
+    return _TOWN_KEY_JUNK.sub(" ", name.lower()).strip()
 
 
 def resolve_town_to_county(location: str) -> str:
@@ -236,16 +259,18 @@ def resolve_town_to_county(location: str) -> str:
     if not location:
         return location
     
-    location_lower = location.lower().strip()
+    location_key = _town_key(location)
     
-    # Check if it's a known town
-    if location_lower in MONTANA_TOWN_TO_COUNTY:
-        county = MONTANA_TOWN_TO_COUNTY[location_lower]
-        logger.info(f"[RESOLVE] '{location}' → '{county}'")
+    # Check if it's a known town (one probe — values are never empty)
+    county = MONTANA_TOWN_TO_COUNTY.get(location_key)
+    if county:
+        # Called per row × term from warehouse scoring — keep it at DEBUG
+        # with lazy args so it costs nothing at the default level.
+        logger.debug("[RESOLVE] %r → %r", location, county)
         return county
     
     # If it already says "County", assume it's a county
-    if "county" in location_lower:
+    if _ALREADY_COUNTY.search(location_key):
         return location
     
     # Otherwise try appending "County"
@@ -265,6 +290,57 @@ def is_lps(specialist: Dict) -> bool:
     return "livestock performance" in role or role == "lps"
 
 
+# Process-local snapshot of the active `specialists` rows, shared by the
+# staff-by-name, staff-by-phone and town lookups. ~13 rows whose territories
+# change a few times a year (always alongside a deploy_retell_config.py run),
+# so a 5-minute TTL keeps Supabase off the call_inbound staff check and the
+# town lookup while a roster edit is still live within minutes.
+# `_specialists_by_county` maps each lowercased county to the first row (in
+# table order) that lists it, built once per fill, so the common town lookup
+# is a dict probe instead of a scan over every county of every specialist.
+# Failed fetches are not cached; the lock collapses a burst of concurrent
+# misses into one query.
+_SPECIALIST_CACHE_TTL_SECONDS = 5 * 60
+_SPECIALIST_COLUMNS = "id, first_name, last_name, email, phone, role, specialties, counties, is_active"
+_specialist_rows: list[dict] = []
+_specialists_by_county: dict[str, dict] = {}
+_specialist_rows_ts: float = 0.0
+_specialist_rows_lock = asyncio.Lock()
+
+
+def _specialist_rows_fresh() -> bool:
+    return bool(_specialist_rows_ts) and time.time() - _specialist_rows_ts < _SPECIALIST_CACHE_TTL_SECONDS
+
+
+async def _active_specialists() -> list[dict]:
+    """All active specialist rows, served from the TTL snapshot when fresh.
+    Raises on a Supabase error so each caller keeps its own error logging.
+    Rows are shared — callers must not mutate them."""
+    global _specialist_rows, _specialists_by_county, _specialist_rows_ts
+    if _specialist_rows_fresh():
+        return _specialist_rows
+
+    async with _specialist_rows_lock:
+        if _specialist_rows_fresh():
+            return _specialist_rows
+
+        result = await run_db(
+            lambda: supabase.table("specialists")
+                .select(_SPECIALIST_COLUMNS)
+                .eq("is_active", True)
+                .execute()
+        )
+        rows = result.data or []
+        by_county: dict[str, dict] = {}
+        for row in rows:
+            for c in row.get("counties") or []:
+                by_county.setdefault((c or "").strip().lower(), row)
+
+        _specialist_rows, _specialists_by_county = rows, by_county
+        _specialist_rows_ts = time.time()
+        return rows
+
+
 async def lookup_staff_by_name(name: str) -> list:
     """
     Fuzzy-match active staff in the `specialists` table by name.
@@ -275,8 +351,9 @@ async def lookup_staff_by_name(name: str) -> list:
     Each result is a dict with: id, first_name, last_name, full_name, email,
     phone, role, specialties, counties, is_lps (live-transfer eligible).
 
-    Implementation: pulls ALL active specialists in one query (~13 rows) and
-    does case-insensitive substring matching in Python. This is intentional:
+    Implementation: reads ALL active specialists (~13 rows, from the
+    `_active_specialists` snapshot) and does case-insensitive substring
+    matching in Python. This is intentional:
     earlier PostgREST `or_()` filters with `%name%` patterns and nested
     `and(...)` clauses were unreliable for multi-word queries (the embedded
     space in "Sheryl Shea" + nested commas confused PostgREST URL parsing
@@ -302,17 +379,8 @@ async def lookup_staff_by_name(name: str) -> list:
     logger.info(f"[STAFF] Looking up by name: '{query}'")
 
     try:
-        # Pull everything active in one shot. ~13 rows; trivial.
-        def _run_query():
-            return (
-                supabase.table("specialists")
-                .select("id, first_name, last_name, email, phone, role, specialties, counties, is_active")
-                .eq("is_active", True)
-                .execute()
-            )
-
-        result = await asyncio.to_thread(_run_query)
-        rows = result.data or []
+        # Everything active, from the roster snapshot. ~13 rows; trivial.
+        rows = await _active_specialists()
 
         # Tokens for matching. Most callers say "first last" but we also
         # handle single names ("Sheryl") and partials ("shea").
@@ -372,7 +440,7 @@ async def lookup_staff_by_name(name: str) -> list:
         return matches
 
     except Exception as e:
-        logger.error(f"[STAFF] lookup_staff_by_name error: {e}", exc_info=True)
+        logger.exception("[STAFF] lookup_staff_by_name error: %s", e)
         return []
 
 
@@ -398,16 +466,7 @@ async def lookup_staff_by_phone(phone: str) -> Optional[Dict]:
         return None
 
     try:
-        def _run_query():
-            return (
-                supabase.table("specialists")
-                .select("id, first_name, last_name, email, phone, role, specialties, counties, is_active")
-                .eq("is_active", True)
-                .execute()
-            )
-
-        result = await asyncio.to_thread(_run_query)
-        for s in result.data or []:
+        for s in await _active_specialists():
             row_digits = "".join(c for c in (s.get("phone") or "") if c.isdigit())[-10:]
             if row_digits and row_digits == digits:
                 first = (s.get("first_name") or "").strip()
@@ -428,7 +487,7 @@ async def lookup_staff_by_phone(phone: str) -> Optional[Dict]:
         return None
 
     except Exception as e:
-        logger.error(f"[STAFF] lookup_staff_by_phone error: {e}", exc_info=True)
+        logger.exception("[STAFF] lookup_staff_by_phone error: %s", e)
         return None
 
 
@@ -440,7 +499,9 @@ async def get_specialist_by_email(email: str) -> Optional[Dict]:
     tool args before sending mail to it — the model's args are caller-
     influenced text, and an unvalidated address would let a caller social-
     engineer outbound email from our domain to anywhere. Same table-scan
-    pattern as the other lookups (~13 rows).
+    pattern as the other lookups (~13 rows), but deliberately queried live
+    rather than from the roster snapshot: a just-deactivated address must
+    stop validating immediately, not up to 5 minutes later.
     """
     if not supabase:
         logger.warning("[STAFF] Supabase not configured")
@@ -449,9 +510,9 @@ async def get_specialist_by_email(email: str) -> Optional[Dict]:
     if not target or "@" not in target:
         return None
     try:
-        result = await asyncio.to_thread(
+        result = await run_db(
             lambda: supabase.table("specialists")
-                .select("id, first_name, last_name, email, phone, role, specialties, is_active")
+                .select("id, first_name, last_name, email, phone, role, is_active")
                 .eq("is_active", True)
                 .execute()
         )
@@ -469,13 +530,19 @@ async def get_specialist_by_email(email: str) -> Optional[Dict]:
                 }
         return None
     except Exception as e:
-        logger.error(f"[STAFF] get_specialist_by_email error: {e}", exc_info=True)
+        logger.exception("[STAFF] get_specialist_by_email error: %s", e)
         return None
 
 
-async def lookup_specialist_by_town(town_name: str) -> Optional[Dict[str, str]]:
+async def lookup_specialist_by_town(town_name: str, county: str = "") -> Optional[Dict[str, str]]:
     """Look up specialist by town/county name with automatic town→county resolution.
 
+    `county` is an optional hint from the caller ("out by Roy, in Fergus
+    County"). It is only used when the town isn't in MONTANA_TOWN_TO_COUNTY
+    (or no town was given) — a known town always resolves through the map.
+    Either way the match comes from the `_active_specialists` roster
+    snapshot, so this is usually a dict probe with no Supabase round-trip.
+
     Returns a dict including `is_lps`, which callers should check before
     attempting a live transfer — non-LPS staff (e.g. Sheryl Shea covering
     NW MT) are message-only.
@@ -485,47 +552,62 @@ async def lookup_specialist_by_town(town_name: str) -> Optional[Dict[str, str]]:
         return None
 
     try:
-        if not town_name or not town_name.strip():
+        town_name = (town_name or "").strip()
+        county = (county or "").strip()
+        if not town_name and not county:
             return None
 
-        county_name = resolve_town_to_county(town_name.strip())
-        logger.info(f"[SPECIALIST] Looking up: '{town_name}' → '{county_name}'")
+        if county and _town_key(town_name) not in MONTANA_TOWN_TO_COUNTY:
+            county_name = resolve_town_to_county(county)
+        else:
+            county_name = resolve_town_to_county(town_name)
+
+        town_lower = town_name.lower()
+        county_lower = county_name.lower()
 
-        # Table scan — needed so we can read `role` and `is_active` to compute
-        # is_lps. The RPC `find_specialist_by_county` doesn't return those
+        logger.info(f"[SPECIALIST] Looking up: '{town_name or county}' → '{county_name}'")
+
+        # Roster rows, not the RPC `find_specialist_by_county` — we need `role`
+        # and `is_active` to compute is_lps. The RPC doesn't return those
         # fields, so a non-LPS like Sheryl Shea would silently look like an LPS
-        # via the RPC path and the agent would try to live-transfer her. With
-        # ~13 specialists this scan is cheap.
-        result = await asyncio.to_thread(
-            lambda: supabase.table("specialists")
-                .select("id, first_name, last_name, phone, email, role, specialties, counties, is_active")
-                .eq("is_active", True)
-                .execute()
+        # via the RPC path and the agent would try to live-transfer her.
+        rows = await _active_specialists()
+
+        # Exact county (or a town listed as its own territory) is one probe
+        # into the index; only a miss falls back to the loose substring scan
+        # ("Fergus" inside "Fergus County, MT") over the cached rows.
+        s = _specialists_by_county.get(county_lower) or (
+            town_lower and _specialists_by_county.get(town_lower)
         )
+        if not s:
+            s = next(
+                (row for row in rows
+                 if any((town_lower and town_lower in (c or "").lower()) or county_lower in (c or "").lower()
+                        for c in row.get("counties") or [])),
+                None,
+            )
 
-        if result.data:
-            for s in result.data:
-                counties = s.get("counties", []) or []
-                if any(town_name.lower() in c.lower() or county_name.lower() in c.lower() for c in counties):
-                    full_name = f"{s.get('first_name', '')} {s.get('last_name', '')}".strip()
-                    specialist_info = {
-                        "id": s.get("id"),
-                        "specialist_name": full_name,
-                        "specialist_phone": s.get("phone", ""),
-                        "specialist_email": s.get("email", ""),
-                        "role": s.get("role", ""),
-                        "specialties": s.get("specialties") or [],
-                        "territory": county_name,
-                        "is_lps": is_lps(s),
-                    }
-                    logger.info(
-                        f"[SPECIALIST] Found: {full_name} "
-                        f"(role={s.get('role')}, is_lps={specialist_info['is_lps']})"
-                    )
-                    return specialist_info
-
-        logger.info(f"[SPECIALIST] No match for: '{town_name}' or '{county_name}'")
-        return None
+        specialist_info = None
+        if s:
+            full_name = f"{s.get('first_name', '')} {s.get('last_name', '')}".strip()
+            specialist_info = {
+                "id": s.get("id"),
+                "specialist_name": full_name,
+                "specialist_phone": s.get("phone", ""),
+                "specialist_email": s.get("email", ""),
+                "role": s.get("role", ""),
+                "specialties": s.get("specialties") or [],
+                "territory": county_name,
+                "is_lps": is_lps(s),
+            }
+            logger.info(
+                f"[SPECIALIST] Found: {full_name} "
+                f"(role={s.get('role')}, is_lps={specialist_info['is_lps']})"
+            )
+        else:
+            logger.info(f"[SPECIALIST] No match for: '{town_name or county}' or '{county_name}'")
+
+        return specialist_info
 
     except Exception as e:
         logger.error(f"[SPECIALIST] Error: {e}")
@@ -12,15 +12,34 @@ PostgREST. This mirrors the deliberate table-scan approach used in
 `specialists.py` (small table, robust matching > clever SQL).
 
 DB-touching function is async + offloads the synchronous Supabase client to a
-worker thread so it never blocks the FastAPI event loop.
+worker thread so it never blocks the FastAPI event loop. Both lookups read the
+same short-TTL snapshot of the active rows (`_active_warehouses`), so repeat
+tool calls and every inbound call's DID check usually skip Supabase entirely.
 """
 
 import asyncio
+import time
 from typing import Optional, Dict, List
 
-from config import supabase, logger
+from config import supabase, logger, run_db
 from .specialists import resolve_town_to_county
 
+# Process-local snapshot of the active warehouse rows. Five stores whose
+# hours/managers/DIDs change a few times a year — a 5-minute TTL means an
+# edit in Supabase is live within minutes, while the inbound hot path (DID
+# match on every call) and get_warehouse stop paying a PostgREST round-trip
+# per request. Failed fetches are not cached; the lock collapses a burst of
+# concurrent misses into one query.
+_WAREHOUSE_CACHE_TTL_SECONDS = 5 * 60
+_WAREHOUSE_COLUMNS = (
+    "warehouse_name, warehouse_code, city, region, address, phone, "
+    "manager_name, manager_email, operating_hours, service_area_description, "
+    "retell_did"
+)
+_warehouse_rows: List[Dict] = []
+_warehouse_rows_ts: float = 0.0
+_warehouse_rows_lock = asyncio.Lock()
+
 
 def _score_warehouse(w: dict, terms: List[str]) -> int:
     """Score how well a warehouse matches the caller's search terms.
@@ -73,6 +92,32 @@ def _score_warehouse(w: dict, terms: List[str]) -> int:
     return best
 
 
+def _warehouse_rows_fresh() -> bool:
+    return bool(_warehouse_rows_ts) and time.time() - _warehouse_rows_ts < _WAREHOUSE_CACHE_TTL_SECONDS
+
+
+async def _active_warehouses() -> List[Dict]:
+    """All active warehouse rows, served from the TTL snapshot when fresh.
+    Raises on a Supabase error so each caller keeps its own error logging."""
+    global _warehouse_rows, _warehouse_rows_ts
+    if _warehouse_rows_fresh():
+        return _warehouse_rows
+
+    async with _warehouse_rows_lock:
+        if _warehouse_rows_fresh():
+            return _warehouse_rows
+
+        result = await run_db(
+            lambda: supabase.table("warehouses")
+                .select(_WAREHOUSE_COLUMNS)
+                .eq("is_active", True)
+                .execute()
+        )
+        _warehouse_rows = result.data or []
+        _warehouse_rows_ts = time.time()
+        return _warehouse_rows
+
+
 async def lookup_warehouse_by_did(to_number: str) -> Optional[Dict]:
     """Match an inbound call's `to_number` against `warehouses.retell_did`.
 
@@ -92,24 +137,15 @@ async def lookup_warehouse_by_did(to_number: str) -> Optional[Dict]:
         return None
 
     try:
-        result = await asyncio.to_thread(
-            lambda: supabase.table("warehouses")
-                .select("warehouse_name, warehouse_code, city, region, address, "
-                        "phone, manager_name, manager_email, operating_hours, "
-                        "retell_did, is_active")
-                .eq("is_active", True)
-                .not_.is_("retell_did", "null")
-                .execute()
-        )
-        for w in result.data or []:
+        for w in await _active_warehouses():
             did_digits = "".join(c for c in (w.get("retell_did") or "") if c.isdigit())[-10:]
             if did_digits and did_digits == digits:
                 logger.info(f"[WAREHOUSE] to_number matched store line: {w.get('warehouse_name')}")
-                return w
+                return dict(w)
         return None
 
     except Exception as e:
-        logger.error(f"[WAREHOUSE] lookup_warehouse_by_did error: {e}", exc_info=True)
+        logger.exception("[WAREHOUSE] lookup_warehouse_by_did error: %s", e)
         return None
 
 
@@ -129,15 +165,7 @@ async def lookup_warehouse(terms: List[str]) -> Optional[Dict]:
     logger.info(f"[WAREHOUSE] Looking up warehouse for terms: {cleaned}")
 
     try:
-        result = await asyncio.to_thread(
-            lambda: supabase.table("warehouses")
-                .select("warehouse_name, warehouse_code, city, region, address, "
-                        "phone, manager_name, operating_hours, "
-                        "service_area_description, is_active")
-                .eq("is_active", True)
-                .execute()
-        )
-        rows = result.data or []
+        rows = await _active_warehouses()
 
         scored = [(w, _score_warehouse(w, cleaned)) for w in rows]
         scored = [(w, s) for w, s in scored if s > 0]
@@ -151,8 +179,8 @@ async def lookup_warehouse(terms: List[str]) -> Optional[Dict]:
             f"[WAREHOUSE] Best match: {best.get('warehouse_name')} "
             f"(score={score})"
         )
-        return best
+        return dict(best)
 
     except Exception as e:
-        logger.error(f"[WAREHOUSE] lookup_warehouse error: {e}", exc_info=True)
+        logger.exception("[WAREHOUSE] lookup_warehouse error: %s", e)
         return None
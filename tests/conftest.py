@@ -0,0 +1,6 @@
+import os
+import sys
+
+# The app is a flat set of top-level modules (main.py, config.py, skills/),
+# not an installed package — make them importable from the repo root.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
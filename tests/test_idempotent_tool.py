@@ -0,0 +1,57 @@
+"""idempotent_tool must only replay responses whose handler actually succeeded."""
+
+import pytest
+
+pytest.importorskip("fastapi")
+from fastapi.testclient import TestClient  # noqa: E402
+
+import main  # noqa: E402
+
+
+def _create_lead_body(call_id: str) -> dict:
+    return {
+        "name": "create_lead",
+        "call": {"call_id": call_id, "from_number": "+14065550100", "to_number": "+14065550199"},
+        "args": {"name": "Guy Hanson", "location": "Polson", "primary_interest": "mineral tubs"},
+    }
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(main, "_tool_replays", {})
+    return TestClient(main.app)
+
+
+def _post_with(monkeypatch, client, body):
+    async def fake_read_and_verify(request):
+        return True, b"", body
+
+    monkeypatch.setattr(main, "read_and_verify", fake_read_and_verify)
+    return client.post("/retell/functions/create_lead", json=body)
+
+
+def test_failed_create_lead_is_retried_not_replayed(monkeypatch, client):
+    outcomes = [False, True]
+    saved = []
+
+    async def fake_capture_lead(*args):
+        saved.append(args)
+        return outcomes[len(saved) - 1]
+
+    monkeypatch.setattr(main, "capture_lead", fake_capture_lead)
+    body = _create_lead_body("call_retry_after_failure")
+
+    first = _post_with(monkeypatch, client, body)
+    assert first.status_code == 200
+    assert first.json()["success"] is False
+
+    # Same call, same args: the failure must not be replayed — the handler
+    # runs again and this time the lead is saved.
+    second = _post_with(monkeypatch, client, body)
+    assert second.json()["success"] is True
+    assert len(saved) == 2
+
+    # Now that it succeeded, a further repeat is replayed without a write.
+    third = _post_with(monkeypatch, client, body)
+    assert third.json() == second.json()
+    assert len(saved) == 2
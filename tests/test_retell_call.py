@@ -0,0 +1,26 @@
+"""RetellCall must keep every usable field even when one is an odd type."""
+
+import pytest
+
+pytest.importorskip("fastapi")
+
+import main  # noqa: E402
+
+
+def test_numeric_from_number_keeps_the_rest_of_the_envelope():
+    call = main.RetellCall.from_body({
+        "call": {"call_id": "call_abc", "from_number": 14065550100, "to_number": None},
+    })
+    assert call.call_id == "call_abc"
+    assert call.from_number == "14065550100"
+    assert call.to_number == ""
+    assert call.caller_key == "14065550100"
+
+
+def test_unusable_field_is_blanked_not_fatal():
+    call = main.RetellCall.from_body({
+        "call": {"call_id": "call_abc", "from_number": {"raw": "+14065550100"}},
+    })
+    assert call.call_id == "call_abc"
+    assert call.from_number == ""
+    assert call.caller_key == "widget_call_abc"